@@ -0,0 +1,242 @@
+"""Single-pass aggregation over scraped contracts.
+
+Each analysis is an Accumulator: it folds contracts into its own running
+totals with add() and prints its findings with report(). run_accumulators
+feeds every registered accumulator from one pass over the data, so adding an
+analysis never adds another full scan.
+
+    @register
+    class MakeCounts(Accumulator):
+        name = "make_counts"
+
+        def __init__(self):
+            self.counts = Counter()
+
+        def add(self, contract):
+            self.counts[(contract.get('vehicle') or {}).get('make')] += 1
+
+        def report(self):
+            print(self.counts.most_common(10))
+
+Accumulators may also implement add_frame(), folding a whole flattened
+DataFrame (see contract_loader.flatten_contract) with vectorized pandas
+operations, and list the frame columns they read in `columns`.
+run_frame_accumulators feeds them frames, such as the one returned by
+load_contract_frame, instead of contracts one at a time.
+
+Accumulators that also implement merge(), state() and from_state() can be
+computed per window file and persisted by PartialAggregates, so a run only
+folds new or changed files and merges the stored partials for the rest.
+"""
+import hashlib
+import json
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from contract_loader import ParquetCache, default_workers
+
+PARTIALS_DIR = ".aggregates"
+
+REGISTRY = {}
+
+def register(cls):
+    """Class decorator adding an accumulator to the default set run by run_accumulators"""
+    REGISTRY[cls.name] = cls
+    return cls
+
+def plain(value):
+    """Convert numpy scalars to Python ones so they serialize as JSON"""
+    return value.item() if isinstance(value, np.generic) else value
+
+def counter_state(counter):
+    # Pairs rather than an object, so int keys (term months) stay ints
+    return [[plain(value), plain(count)] for value, count in counter.items()]
+
+def counter_from_state(pairs):
+    return Counter({value: count for value, count in pairs})
+
+def merge_min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+def merge_max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+class Accumulator:
+    name = None
+    columns = ()
+    # Bump when add_frame or state changes, so persisted partials are recomputed
+    version = 1
+
+    def add(self, contract):
+        """Fold one contract into the running totals"""
+        raise NotImplementedError
+
+    def add_frame(self, df):
+        """Fold a flattened contract DataFrame into the running totals"""
+        raise NotImplementedError
+
+    def merge(self, other):
+        """Fold in the totals of another accumulator of the same class"""
+        raise NotImplementedError
+
+    def state(self):
+        """The running totals as JSON-serializable data"""
+        raise NotImplementedError
+
+    @classmethod
+    def from_state(cls, state):
+        raise NotImplementedError
+
+    def report(self):
+        """Print the analysis"""
+        raise NotImplementedError
+
+def run_accumulators(contracts, accumulators=None):
+    """
+    Feed every contract to every accumulator in one pass
+
+    `accumulators` defaults to one fresh instance of each registered class.
+    Returns the accumulators so callers can report or inspect them.
+    """
+    if accumulators is None:
+        accumulators = [cls() for cls in REGISTRY.values()]
+    adders = [accumulator.add for accumulator in accumulators]
+    for contract in contracts:
+        for add in adders:
+            add(contract)
+    return accumulators
+
+def frame_columns(accumulators):
+    """All flattened columns the accumulators read, for load_contract_frame(columns=...)"""
+    return list(dict.fromkeys(column for accumulator in accumulators for column in accumulator.columns))
+
+def run_frame_accumulators(frames, accumulators=None):
+    """Like run_accumulators, feeding each accumulator whole DataFrames"""
+    if accumulators is None:
+        accumulators = [cls() for cls in REGISTRY.values()]
+    for df in frames:
+        for accumulator in accumulators:
+            accumulator.add_frame(df)
+    return accumulators
+
+class PartialAggregates:
+    """
+    Per-window-file partial aggregates persisted in scraped_data/.aggregates/
+
+    Each window file's partial holds the states of the accumulators run over
+    it. A partial is reused while the file's Parquet cache entry is unchanged
+    and the file still holds the latest version of the same contracts, so a
+    run folds only new or changed files and merges the stored partials.
+
+    A contract that appears in several files is counted in the one holding its
+    latest updated_at version, as load_contract_frame keeps it. Working that
+    out reads only the id and updated_at columns of every cached file.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.partials_dir = os.path.join(directory, PARTIALS_DIR)
+        os.makedirs(self.partials_dir, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.partials_dir, name + ".json")
+
+    def _load(self, name):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _save(self, name, partial):
+        path = self._path(name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(partial, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _owned_rows(paths):
+        """Map each cached file to the row positions holding a contract's latest version"""
+        frames = []
+        for index, path in enumerate(paths):
+            available = set(pq.read_schema(path).names)
+            df = pd.read_parquet(path, columns=[c for c in ("id", "updated_at") if c in available])
+            frames.append(df.assign(file=index, row=np.arange(len(df))))
+        if not frames:
+            return {}
+
+        # Same rule as load_contract_frame: latest updated_at wins, ties go to the later file
+        rows = pd.concat(frames, ignore_index=True)
+        if "updated_at" in rows.columns:
+            rows = rows.sort_values("updated_at", kind="stable", na_position="first")
+        if "id" in rows.columns:
+            rows = rows.drop_duplicates("id", keep="last")
+        return {
+            paths[index]: np.sort(group["row"].to_numpy())
+            for index, group in rows.groupby("file")
+        }
+
+    def run(self, accumulator_classes, prepare=None, workers=None):
+        """
+        Return one merged accumulator per class, folding only stale files
+
+        `prepare` is applied to each file's frame before it is folded, e.g. to
+        convert columns to categoricals.
+        """
+        cache = ParquetCache(self.directory)
+        converted = cache.refresh(workers or default_workers())
+        if converted:
+            print(f"Cached {converted} new or modified files as Parquet")
+
+        paths = cache.cached_paths()
+        owned = self._owned_rows(paths)
+        columns = frame_columns(accumulator_classes)
+        merged = {cls.name: cls() for cls in accumulator_classes}
+
+        recomputed = 0
+        names = set()
+        for path in paths:
+            name = os.path.basename(path)[:-len(".parquet")]
+            names.add(name)
+            rows = owned.get(path, np.empty(0, dtype=np.int64))
+            entry = cache.index[name]
+            key = {
+                "size": entry["size"],
+                "mtime_ns": entry["mtime_ns"],
+                "rows": hashlib.sha1(rows.astype(np.int64).tobytes()).hexdigest(),
+            }
+
+            partial = self._load(name)
+            states = partial["accumulators"] if partial and partial.get("key") == key else {}
+            stale = [
+                cls for cls in accumulator_classes
+                if states.get(cls.name, {}).get("version") != cls.version
+            ]
+            if stale:
+                available = set(pq.read_schema(path).names)
+                df = pd.read_parquet(path, columns=[c for c in columns if c in available])
+                df = df.iloc[rows]
+                if prepare is not None:
+                    df = prepare(df)
+                for cls in stale:
+                    accumulator = cls()
+                    if not df.empty:
+                        accumulator.add_frame(df)
+                    states[cls.name] = {"version": cls.version, "state": accumulator.state()}
+                self._save(name, {"key": key, "accumulators": states})
+                recomputed += 1
+
+            for cls in accumulator_classes:
+                merged[cls.name].merge(cls.from_state(states[cls.name]["state"]))
+
+        # Drop partials whose window file is gone
+        for file_name in os.listdir(self.partials_dir):
+            if file_name.endswith(".json") and file_name[:-len(".json")] not in names:
+                os.remove(os.path.join(self.partials_dir, file_name))
+
+        print(f"Recomputed partial aggregates for {recomputed} of {len(paths)} files")
+        return list(merged.values())
@@ -1,37 +1,24 @@
-import json
-import os
 from collections import defaultdict
 from datetime import datetime
 import pandas as pd
 
-def load_json_files(directory):
-    """Load all JSON files from the specified directory."""
-    all_contracts = []
-    for filename in os.listdir(directory):
-        if filename.endswith('.json'):
-            file_path = os.path.join(directory, filename)
-            try:
-                with open(file_path, 'r') as f:
-                    contracts = json.load(f)
-                    if isinstance(contracts, list):
-                        all_contracts.extend(contracts)
-                    else:
-                        all_contracts.append(contracts)
-            except json.JSONDecodeError:
-                print(f"Error reading {filename}")
-    return all_contracts
+from contract_loader import iter_contracts
 
 def analyze_contract_types(contracts):
-    """Analyze contract types and their relationships."""
+    """Analyze contract types and their relationships.
+
+    Makes a single pass, so `contracts` can be a list or a streaming iterator.
+    """
     
     # Create mappings for analysis
     model_class_to_type = defaultdict(set)
     type_to_product = defaultdict(set)
     model_class_counts = defaultdict(int)
     contract_type_counts = defaultdict(int)
+    sample_contract = None
     
     # Analyze relationships
-    for contract in contracts:
+    for index, contract in enumerate(contracts):
         model_class = contract.get('model_class', '')
         contract_type = contract.get('contract_type', '')
         product_info = contract.get('product', {})
@@ -44,6 +31,8 @@ def analyze_contract_types(contracts):
             product_type = product_info.get('type', '')
             if product_type:
                 type_to_product[contract_type].add(product_type)
+            if sample_contract is None and index < 1000:  # Sample from the first 1000
+                sample_contract = contract
     
     # Print analysis
     print("\nContract Type Analysis")
@@ -66,20 +55,18 @@ def analyze_contract_types(contracts):
     print("\nDetailed Product Analysis by Contract Type")
     print("-" * 80)
     
-    for contract in contracts[:1000]:  # Analyze first 1000 for sample
-        if contract.get('product'):
-            contract_type = contract.get('contract_type', '')
-            product = contract.get('product', {})
-            print(f"\nContract Type: {contract_type}")
-            print("Product Details:")
-            for key, value in product.items():
-                print(f"  {key}: {value}")
-            print("-" * 40)
-            break  # Show one example per contract type
+    if sample_contract is not None:
+        contract_type = sample_contract.get('contract_type', '')
+        product = sample_contract.get('product', {})
+        print(f"\nContract Type: {contract_type}")
+        print("Product Details:")
+        for key, value in product.items():
+            print(f"  {key}: {value}")
+        print("-" * 40)
 
 def main():
     print("Loading contract data...")
-    contracts = load_json_files('scraped_data')
+    contracts = iter_contracts('scraped_data')
     
     print("\nAnalyzing contract types...")
     analyze_contract_types(contracts)
@@ -1,144 +1,471 @@
-import json
-import os
-from collections import defaultdict
+import argparse
+from collections import Counter
+
 import pandas as pd
 
-def load_json_files(directory):
-    """Load all JSON files from the specified directory."""
-    all_contracts = []
-    for filename in os.listdir(directory):
-        if filename.endswith('.json'):
-            file_path = os.path.join(directory, filename)
-            try:
-                with open(file_path, 'r') as f:
-                    contracts = json.load(f)
-                    if isinstance(contracts, list):
-                        all_contracts.extend(contracts)
-                    else:
-                        all_contracts.append(contracts)
-            except json.JSONDecodeError:
-                print(f"Error reading {filename}")
-    return all_contracts
+from aggregation import (REGISTRY, Accumulator, PartialAggregates, counter_from_state,
+                         counter_state, merge_max, merge_min, plain, register,
+                         run_accumulators)
+from sketches import HyperLogLog, KLLSketch
 
-def analyze_warranty_products(contracts):
-    """Analyze warranty product details and pricing."""
-    warranty_products = defaultdict(list)
-    
-    for contract in contracts:
-        if contract.get('model_class') == 'App\\Contracts\\Warranty\\WarrantyContract':
-            product = contract.get('product', {})
-            if product:
-                warranty_products['type'].append(product.get('type', ''))
-                warranty_products['term'].append(product.get('term', ''))
-                warranty_products['distance'].append(product.get('distance', ''))
-                warranty_products['dealer_cost'].append(product.get('dealer_cost', 0))
-                warranty_products['claim_amount'].append(product.get('claim_amount', 0))
-                warranty_products['max_model_years'].append(product.get('max_model_years', 0))
-                warranty_products['max_model_km'].append(product.get('max_model_km', 0))
-    
-    df = pd.DataFrame(warranty_products)
-    
-    print("\nWarranty Product Analysis")
-    print("-" * 80)
-    
-    print("\nWarranty Types:")
-    print(df['type'].value_counts().head(10))
-    
-    print("\nCommon Terms:")
-    print(df['term'].value_counts().head(10))
-    
-    print("\nDistance Limits:")
-    print(df['distance'].value_counts().head(10))
-    
-    print("\nPricing Analysis:")
-    print(f"Average Dealer Cost: ${df['dealer_cost'].mean()/100:,.2f}")
-    print(f"Max Dealer Cost: ${df['dealer_cost'].max()/100:,.2f}")
-    print(f"Min Dealer Cost: ${df['dealer_cost'].min()/100:,.2f}")
+WARRANTY_CLASS = 'App\\Contracts\\Warranty\\WarrantyContract'
+
+# Low-cardinality text columns, grouped and counted far faster as categoricals
+CATEGORY_COLUMNS = ['model_class', 'product_type', 'vehicle_make', 'vehicle_model',
+                    'vehicle_vehicle_usage']
+
+def _column(df, name):
+    """A frame column, or all-missing if no window file had the field"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object)
+
+def _present(df, prefix):
+    """Rows where the nested object (product_, vehicle_) had any field"""
+    columns = [column for column in df.columns if column.startswith(prefix)]
+    if not columns:
+        return pd.Series(False, index=df.index)
+    return df[columns].notna().any(axis=1)
+
+def _numeric(series):
+    return pd.to_numeric(series, errors='coerce')
+
+def _value_counts(series, missing=''):
+    """value_counts as a dict, counting missing values under `missing`"""
+    counts = series.value_counts(dropna=False, sort=False)
+    return {missing if pd.isna(value) else value: int(count)
+            for value, count in counts.items() if count}
+
+def _as_bool(series):
+    # Mixed-type columns are cached as text, so "True" has to count too
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        return series.isin([True, 1, 'True', 'true', '1'])
+    return series.fillna(False).astype(bool)
+
+def categorize(df):
+    """Convert the low-cardinality text columns to categoricals in place"""
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+def print_counts(counts, limit=None, sort_keys=False):
+    """Print value counts most common first, or by value with sort_keys"""
+    items = sorted(counts.items()) if sort_keys else counts.most_common(limit)
+    for value, count in items:
+        print(f"{value!s:<30}{count:>8}")
+
+@register
+class WarrantyProducts(Accumulator):
+    """Warranty product details and pricing"""
+    name = "warranty"
+    columns = ('model_class', 'product_type', 'product_term', 'product_distance',
+               'product_dealer_cost')
+
+    def __init__(self):
+        self.types = Counter()
+        self.terms = Counter()
+        self.distances = Counter()
+        self.count = 0
+        self.cost_total = 0
+        self.cost_min = None
+        self.cost_max = None
+
+    def add(self, contract):
+        if contract.get('model_class') != WARRANTY_CLASS:
+            return
+        product = contract.get('product', {})
+        if not product:
+            return
+        self.types[product.get('type', '')] += 1
+        self.terms[product.get('term', '')] += 1
+        self.distances[product.get('distance', '')] += 1
+
+        dealer_cost = product.get('dealer_cost', 0)
+        self._add_costs(1, dealer_cost, dealer_cost, dealer_cost)
+
+    def add_frame(self, df):
+        warranty = df[(_column(df, 'model_class') == WARRANTY_CLASS) & _present(df, 'product_')]
+        if warranty.empty:
+            return
+        self.types.update(_value_counts(_column(warranty, 'product_type')))
+        self.terms.update(_value_counts(_column(warranty, 'product_term')))
+        self.distances.update(_value_counts(_column(warranty, 'product_distance')))
+
+        dealer_cost = _numeric(_column(warranty, 'product_dealer_cost')).fillna(0)
+        self._add_costs(len(warranty), dealer_cost.sum(), dealer_cost.min(), dealer_cost.max())
+
+    def _add_costs(self, count, total, low, high):
+        self.count += count
+        self.cost_total += total
+        self.cost_min = merge_min(self.cost_min, low)
+        self.cost_max = merge_max(self.cost_max, high)
+
+    def merge(self, other):
+        self.types.update(other.types)
+        self.terms.update(other.terms)
+        self.distances.update(other.distances)
+        if other.count:
+            self._add_costs(other.count, other.cost_total, other.cost_min, other.cost_max)
+
+    def state(self):
+        return {
+            'types': counter_state(self.types),
+            'terms': counter_state(self.terms),
+            'distances': counter_state(self.distances),
+            'count': self.count,
+            'cost_total': plain(self.cost_total),
+            'cost_min': plain(self.cost_min),
+            'cost_max': plain(self.cost_max),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        accumulator = cls()
+        accumulator.types = counter_from_state(state['types'])
+        accumulator.terms = counter_from_state(state['terms'])
+        accumulator.distances = counter_from_state(state['distances'])
+        accumulator.count = state['count']
+        accumulator.cost_total = state['cost_total']
+        accumulator.cost_min = state['cost_min']
+        accumulator.cost_max = state['cost_max']
+        return accumulator
+
+    def report(self):
+        print("\nWarranty Product Analysis")
+        print("-" * 80)
+        if not self.count:
+            print("No warranty contracts found")
+            return
+
+        print("\nWarranty Types:")
+        print_counts(self.types, 10)
+
+        print("\nCommon Terms:")
+        print_counts(self.terms, 10)
+
+        print("\nDistance Limits:")
+        print_counts(self.distances, 10)
+
+        print("\nPricing Analysis:")
+        print(f"Average Dealer Cost: ${self.cost_total / self.count / 100:,.2f}")
+        print(f"Max Dealer Cost: ${self.cost_max / 100:,.2f}")
+        print(f"Min Dealer Cost: ${self.cost_min / 100:,.2f}")
+
+@register
+class GapProducts(Accumulator):
+    """GAP insurance products"""
+    name = "gap"
+    columns = ('model_class', 'product_term_months', 'product_dealer_cost', 'product_double_gap')
+
+    def __init__(self):
+        self.terms = Counter()
+        self.count = 0
+        self.cost_total = 0
+        self.double_gap = 0
+
+    def add(self, contract):
+        if 'GAP' not in contract.get('model_class', ''):
+            return
+        product = contract.get('product', {})
+        if not product:
+            return
+        try:
+            term_months = int(product.get('term_months', 0))
+        except (ValueError, TypeError):
+            term_months = 0
+
+        # 0 term months are left out of the distribution
+        if term_months > 0:
+            self.terms[term_months] += 1
+        self.count += 1
+        self.cost_total += product.get('dealer_cost', 0)
+        self.double_gap += bool(product.get('double_gap', False))
+
+    def add_frame(self, df):
+        is_gap = _column(df, 'model_class').astype(object).str.contains('GAP', na=False, regex=False)
+        gap = df[is_gap & _present(df, 'product_')]
+        if gap.empty:
+            return
+        term_months = _numeric(_column(gap, 'product_term_months')).fillna(0).astype(int)
+        self.terms.update(_value_counts(term_months[term_months > 0]))
+        self.count += len(gap)
+        self.cost_total += _numeric(_column(gap, 'product_dealer_cost')).fillna(0).sum()
+        self.double_gap += int(_as_bool(_column(gap, 'product_double_gap')).sum())
+
+    def merge(self, other):
+        self.terms.update(other.terms)
+        self.count += other.count
+        self.cost_total += other.cost_total
+        self.double_gap += other.double_gap
+
+    def state(self):
+        return {
+            'terms': counter_state(self.terms),
+            'count': self.count,
+            'cost_total': plain(self.cost_total),
+            'double_gap': self.double_gap,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        accumulator = cls()
+        accumulator.terms = counter_from_state(state['terms'])
+        accumulator.count = state['count']
+        accumulator.cost_total = state['cost_total']
+        accumulator.double_gap = state['double_gap']
+        return accumulator
+
+    def report(self):
+        if not self.count:
+            return
 
-def analyze_gap_products(contracts):
-    """Analyze GAP insurance products."""
-    gap_products = []
-    
-    for contract in contracts:
-        if 'GAP' in contract.get('model_class', ''):
-            product = contract.get('product', {})
-            if product:
-                try:
-                    term_months = int(product.get('term_months', 0))
-                except (ValueError, TypeError):
-                    term_months = 0
-                    
-                gap_products.append({
-                    'type': product.get('type', ''),
-                    'term_months': term_months,
-                    'dealer_cost': product.get('dealer_cost', 0),
-                    'double_gap': bool(product.get('double_gap', False))
-                })
-    
-    if gap_products:
-        df = pd.DataFrame(gap_products)
-        
         print("\nGAP Product Analysis")
         print("-" * 80)
-        
-        # Filter out 0 term months for the distribution
-        valid_terms = df[df['term_months'] > 0]
-        if not valid_terms.empty:
+
+        if self.terms:
             print("\nTerm Length Distribution (months):")
-            print(valid_terms['term_months'].value_counts().sort_index())
-        
+            print_counts(self.terms, sort_keys=True)
+
         print("\nPricing Analysis:")
-        print(f"Average Dealer Cost: ${df['dealer_cost'].mean()/100:,.2f}")
-        print(f"Double GAP Contracts: {df['double_gap'].sum()}")
-        print(f"Total GAP Contracts: {len(df)}")
+        print(f"Average Dealer Cost: ${self.cost_total / self.count / 100:,.2f}")
+        print(f"Double GAP Contracts: {self.double_gap}")
+        print(f"Total GAP Contracts: {self.count}")
+
+@register
+class VehicleTypes(Accumulator):
+    """Vehicle makes and their characteristics"""
+    name = "vehicles"
+    columns = ('vehicle_make', 'vehicle_model', 'vehicle_year', 'vehicle_vehicle_usage')
+
+    def __init__(self):
+        self.makes = {}
+
+    # How each make's distinct models are kept; SketchedVehicleTypes swaps in HyperLogLog
+    _new_models = set
+
+    @staticmethod
+    def _merge_models(models, other):
+        models.update(other)
+
+    @staticmethod
+    def _models_state(models):
+        return list(models)
+
+    @staticmethod
+    def _models_from_state(state):
+        return set(state)
+
+    def _make(self, make):
+        data = self.makes.get(make)
+        if data is None:
+            data = self.makes[make] = {
+                'total': 0,
+                'models': self._new_models(),
+                'year_min': None,
+                'year_max': None,
+                'usage_types': set()
+            }
+        return data
+
+    def _add_years(self, data, low, high):
+        data['year_min'] = merge_min(data['year_min'], low)
+        data['year_max'] = merge_max(data['year_max'], high)
+
+    def add(self, contract):
+        vehicle = contract.get('vehicle', {})
+        if not vehicle:
+            return
+        data = self._make(vehicle.get('make', 'Unknown'))
+        data['total'] += 1
+        data['models'].add(vehicle.get('model', 'Unknown'))
+        year = vehicle.get('year', 0)
+        if year:
+            self._add_years(data, year, year)
+        data['usage_types'].add(vehicle.get('vehicle_usage', 'Unknown'))
+
+    def add_frame(self, df):
+        vehicles = df[_present(df, 'vehicle_')]
+        if vehicles.empty:
+            return
+        vehicles = pd.DataFrame({
+            'make': _column(vehicles, 'vehicle_make'),
+            'model': _column(vehicles, 'vehicle_model'),
+            'year': _numeric(_column(vehicles, 'vehicle_year')).where(lambda year: year > 0),
+            'usage': _column(vehicles, 'vehicle_vehicle_usage'),
+        })
+        grouped = vehicles.groupby('make', observed=True, dropna=False, sort=False)
+        summary = grouped.agg(total=('model', 'size'), year_min=('year', 'min'),
+                              year_max=('year', 'max'))
+        models = grouped['model'].unique()
+        usage = grouped['usage'].unique()
+
+        # One Python step per make, not per contract
+        for make, row, make_models, make_usage in zip(summary.index, summary.itertuples(),
+                                                      models, usage):
+            data = self._make('Unknown' if pd.isna(make) else make)
+            data['total'] += int(row.total)
+            data['models'].update('Unknown' if pd.isna(m) else m for m in make_models)
+            data['usage_types'].update('Unknown' if pd.isna(u) else u for u in make_usage)
+            if not pd.isna(row.year_min):
+                self._add_years(data, int(row.year_min), int(row.year_max))
+
+    def merge(self, other):
+        for make, other_data in other.makes.items():
+            data = self._make(make)
+            data['total'] += other_data['total']
+            self._merge_models(data['models'], other_data['models'])
+            data['usage_types'].update(other_data['usage_types'])
+            self._add_years(data, other_data['year_min'], other_data['year_max'])
+
+    def state(self):
+        return {'makes': [
+            [make, {
+                'total': data['total'],
+                'models': self._models_state(data['models']),
+                'year_min': data['year_min'],
+                'year_max': data['year_max'],
+                'usage_types': list(data['usage_types']),
+            }]
+            for make, data in self.makes.items()
+        ]}
+
+    @classmethod
+    def from_state(cls, state):
+        accumulator = cls()
+        for make, data in state['makes']:
+            accumulator.makes[make] = dict(data, models=cls._models_from_state(data['models']),
+                                           usage_types=set(data['usage_types']))
+        return accumulator
+
+    def report(self):
+        print("\nVehicle Analysis")
+        print("-" * 80)
+
+        print("\nTop 10 Vehicle Makes:")
+        sorted_makes = sorted(self.makes.items(), key=lambda x: x[1]['total'], reverse=True)
+        for make, data in sorted_makes[:10]:
+            print(f"\n{make}:")
+            print(f"Total Contracts: {data['total']}")
+            print(f"Unique Models: {len(data['models'])}")
+            if data['year_min'] is not None:
+                print(f"Year Range: {data['year_min']} - {data['year_max']}")
+            print(f"Usage Types: {', '.join(str(usage) for usage in data['usage_types'])}")
+
+class SketchedVehicleTypes(VehicleTypes):
+    """VehicleTypes counting each make's distinct models with HyperLogLog"""
+    name = "vehicles_sketch"
+    version = 2
+
+    _new_models = HyperLogLog
+
+    @staticmethod
+    def _merge_models(models, other):
+        models.merge(other)
+
+    @staticmethod
+    def _models_state(models):
+        return models.state()
+
+    @staticmethod
+    def _models_from_state(state):
+        return HyperLogLog.from_state(state)
+
+class PricingQuantiles(Accumulator):
+    """Dealer cost and claim amount percentiles per contract type, from KLL sketches"""
+    name = "pricing_quantiles"
+    columns = ('contract_type', 'product_dealer_cost', 'product_claim_amount')
+    fields = ('dealer_cost', 'claim_amount')
+    quantiles = (0.5, 0.9, 0.99)
+
+    def __init__(self):
+        self.sketches = {}
+
+    def _sketches(self, contract_type):
+        sketches = self.sketches.get(contract_type)
+        if sketches is None:
+            sketches = self.sketches[contract_type] = {field: KLLSketch() for field in self.fields}
+        return sketches
+
+    def add(self, contract):
+        product = contract.get('product') or {}
+        sketches = self._sketches(contract.get('contract_type') or 'Unknown')
+        for field in self.fields:
+            if product.get(field) is not None:
+                sketches[field].add(product[field])
+
+    def add_frame(self, df):
+        grouped = df.groupby(_column(df, 'contract_type'), observed=True, dropna=False, sort=False)
+        for contract_type, group in grouped:
+            sketches = self._sketches('Unknown' if pd.isna(contract_type) else contract_type)
+            for field in self.fields:
+                sketches[field].update(_column(group, f'product_{field}'))
+
+    def merge(self, other):
+        for contract_type, other_sketches in other.sketches.items():
+            sketches = self._sketches(contract_type)
+            for field in self.fields:
+                sketches[field].merge(other_sketches[field])
+
+    def state(self):
+        return [
+            [contract_type, {field: sketch.state() for field, sketch in sketches.items()}]
+            for contract_type, sketches in self.sketches.items()
+        ]
+
+    @classmethod
+    def from_state(cls, state):
+        accumulator = cls()
+        for contract_type, sketches in state:
+            accumulator.sketches[contract_type] = {
+                field: KLLSketch.from_state(sketch) for field, sketch in sketches.items()
+            }
+        return accumulator
+
+    def report(self):
+        print("\nPricing Percentiles (approximate)")
+        print("-" * 80)
+        print(f"{'contract type':<16}{'field':<14}{'count':>9}"
+              + "".join(f"{f'p{q * 100:g}':>12}" for q in self.quantiles))
+        for contract_type, sketches in sorted(self.sketches.items(), key=lambda item: str(item[0])):
+            for field, sketch in sketches.items():
+                if not len(sketch):
+                    continue
+                print(f"{contract_type!s:<16}{field:<14}{len(sketch):>9}"
+                      + "".join(f"{f'${sketch.quantile(q) / 100:,.2f}':>12}" for q in self.quantiles))
+
+# Sketch mode swaps in these variants and adds the percentile analysis
+SKETCH_VARIANTS = {VehicleTypes.name: SketchedVehicleTypes}
+SKETCH_ONLY = [PricingQuantiles]
+
+def analyze_warranty_products(contracts):
+    """Analyze warranty product details and pricing."""
+    run_accumulators(contracts, [WarrantyProducts()])[0].report()
+
+def analyze_gap_products(contracts):
+    """Analyze GAP insurance products."""
+    run_accumulators(contracts, [GapProducts()])[0].report()
 
 def analyze_vehicle_types(contracts):
     """Analyze vehicle types and their characteristics."""
-    # Initialize the nested defaultdict with proper data structures
-    vehicle_data = {}
-    
-    for contract in contracts:
-        vehicle = contract.get('vehicle', {})
-        if vehicle:
-            make = vehicle.get('make', 'Unknown')
-            model = vehicle.get('model', 'Unknown')
-            year = vehicle.get('year', 0)
-            usage = vehicle.get('vehicle_usage', 'Unknown')
-            
-            if make not in vehicle_data:
-                vehicle_data[make] = {
-                    'total': 0,
-                    'models': set(),
-                    'years': set(),
-                    'usage_types': set()
-                }
-            
-            vehicle_data[make]['total'] += 1
-            vehicle_data[make]['models'].add(model)
-            if year:
-                vehicle_data[make]['years'].add(year)
-            vehicle_data[make]['usage_types'].add(usage)
-    
-    print("\nVehicle Analysis")
-    print("-" * 80)
-    
-    print("\nTop 10 Vehicle Makes:")
-    sorted_makes = sorted(vehicle_data.items(), key=lambda x: x[1]['total'], reverse=True)
-    for make, data in sorted_makes[:10]:
-        print(f"\n{make}:")
-        print(f"Total Contracts: {data['total']}")
-        print(f"Unique Models: {len(data['models'])}")
-        if data['years']:
-            print(f"Year Range: {min(data['years'])} - {max(data['years'])}")
-        print(f"Usage Types: {', '.join(data['usage_types'])}")
+    run_accumulators(contracts, [VehicleTypes()])[0].report()
 
 def main():
+    parser = argparse.ArgumentParser(description="Analyze warranty, GAP and vehicle products")
+    parser.add_argument("--directory", default="scraped_data")
+    parser.add_argument("--sketch", action="store_true",
+                        help="approximate distinct models and pricing percentiles in bounded memory")
+    args = parser.parse_args()
+
+    classes = list(REGISTRY.values())
+    if args.sketch:
+        classes = [SKETCH_VARIANTS.get(cls.name, cls) for cls in classes] + SKETCH_ONLY
+
     print("Loading contract data...")
-    contracts = load_json_files('scraped_data')
-    
-    analyze_warranty_products(contracts)
-    analyze_gap_products(contracts)
-    analyze_vehicle_types(contracts)
+    # Each window file is folded once, vectorized, into a persisted partial;
+    # later runs fold only new or changed files and merge the rest
+    for accumulator in PartialAggregates(args.directory).run(classes, prepare=categorize):
+        accumulator.report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,153 @@
+"""Multi-process backfill coordinator for CanadaGeneralScraper.
+
+The date range is split into shards of whole scrape windows and put on a local
+work queue. Each worker process logs in with its own session, takes shards off
+the queue and scrapes them, drawing from one SharedTokenBucket so the total
+request rate stays under the politeness budget however many workers run.
+Workers report progress back to the coordinator over a second queue.
+
+Each shard is checkpointed in its own manifest (scraped_data/manifest_<from>_to_<to>.json),
+so rerunning the same command resumes where the last run stopped.
+
+    python backfill.py --start 2017-11-01 --end 2019-06-15 --workers 4 --requests-per-second 2
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+
+from scraper import CanadaGeneralScraper, ScrapeManifest, SharedTokenBucket, iter_windows
+
+def plan_shards(start_date, end_date, interval_days=1, windows_per_shard=30):
+    """
+    Split the range into shards of whole windows
+
+    Shards start on window boundaries, so scraping a shard with the same
+    interval_days produces exactly the windows a single serial run would.
+    """
+    windows = list(iter_windows(start_date, end_date, interval_days))
+    return [
+        (chunk[0][0], chunk[-1][1])
+        for chunk in (windows[i:i + windows_per_shard]
+                      for i in range(0, len(windows), windows_per_shard))
+    ]
+
+def shard_manifest_path(output_dir, shard_from, shard_to):
+    return os.path.join(output_dir, f"manifest_{shard_from}_to_{shard_to}.json")
+
+def worker(worker_id, credentials, rate_limiter, shards, progress, interval_days, concurrency):
+    """Log in, then scrape shards off the queue until the None sentinel arrives"""
+    scraper = CanadaGeneralScraper(rate_limiter=rate_limiter)
+    if not scraper.login(*credentials):
+        progress.put(("login_failed", worker_id, None, None))
+        return
+
+    scraper.record_callbacks.append(
+        lambda records: progress.put(("window", worker_id, None, len(records)))
+    )
+
+    while True:
+        shard = shards.get()
+        if shard is None:
+            break
+
+        shard_from, shard_to = shard
+        scraper.manifest = ScrapeManifest(shard_manifest_path(scraper.output_dir, shard_from, shard_to))
+        scraper.scrape_data(shard_from, shard_to, interval_days, concurrency=concurrency)
+        progress.put(("shard", worker_id, shard, len(scraper.manifest.failed_windows())))
+
+    progress.put(("exit", worker_id, None, None))
+
+def run_backfill(start_date, end_date, username, password, workers=4,
+                 requests_per_second=1.0, burst=1, interval_days=1,
+                 windows_per_shard=30, concurrency=1):
+    """Scrape [start_date, end_date] with `workers` processes; return the failed shards"""
+    shards = plan_shards(start_date, end_date, interval_days, windows_per_shard)
+    rate_limiter = SharedTokenBucket(requests_per_second, burst)
+    shard_queue = multiprocessing.Queue()
+    progress = multiprocessing.Queue()
+
+    for shard in shards:
+        shard_queue.put(shard)
+    for _ in range(workers):
+        shard_queue.put(None)
+
+    print(f"Backfilling {start_date} to {end_date}: {len(shards)} shards, "
+          f"{workers} workers, {requests_per_second} requests/s")
+
+    processes = [
+        multiprocessing.Process(
+            target=worker,
+            args=(worker_id, (username, password), rate_limiter, shard_queue,
+                  progress, interval_days, concurrency),
+        )
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    started = time.perf_counter()
+    running = workers
+    shards_done = 0
+    windows_done = 0
+    records_done = 0
+    failed_shards = []
+
+    while running:
+        try:
+            event, worker_id, shard, value = progress.get(timeout=5)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                print("All workers exited unexpectedly")
+                break
+            continue
+
+        if event == "window":
+            windows_done += 1
+            records_done += value
+        elif event == "shard":
+            shards_done += 1
+            if value:
+                failed_shards.append(shard)
+            elapsed = time.perf_counter() - started
+            print(f"[worker {worker_id}] finished {shard[0]} to {shard[1]} "
+                  f"({value} failed windows) - {shards_done}/{len(shards)} shards, "
+                  f"{windows_done} windows, {records_done} records, "
+                  f"{records_done / elapsed:,.0f} records/s")
+        elif event == "login_failed":
+            print(f"[worker {worker_id}] login failed")
+            running -= 1
+        elif event == "exit":
+            running -= 1
+
+    for process in processes:
+        process.join()
+
+    if failed_shards:
+        print(f"{len(failed_shards)} shards have failed windows; rerun to retry them")
+    return failed_shards
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill contracts with several worker processes")
+    parser.add_argument("--start", required=True, help="first date, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="last date, YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests-per-second", type=float, default=1.0,
+                        help="total request rate across all workers")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--interval-days", type=int, default=1)
+    parser.add_argument("--windows-per-shard", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="windows in flight within each worker")
+    args = parser.parse_args()
+
+    username = os.environ.get("CANADA_GENERAL_USERNAME", "username")
+    password = os.environ.get("CANADA_GENERAL_PASSWORD", "password")
+
+    run_backfill(args.start, args.end, username, password, args.workers,
+                 args.requests_per_second, args.burst, args.interval_days,
+                 args.windows_per_shard, args.concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""End-to-end scraper throughput benchmark against the local mock server.
+
+Runs the serial, concurrent and adaptive scrape modes over the same synthetic
+date range and prints records/s and latency for each, taken from the scraper's
+own metrics summary. With --baseline the results are compared to a previous
+run and the script exits non-zero if any mode lost more than --tolerance of its
+throughput, so scraper regressions are caught without touching the real site.
+
+    python benchmark_scraper.py --days 60 --latency 0.05 --save-baseline bench_baseline.json
+    python benchmark_scraper.py --days 60 --latency 0.05 --baseline bench_baseline.json
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from mock_server import MockConfig, start_server
+from scraper import CanadaGeneralScraper
+
+def run_mode(mode, base_url, start_date, end_date, concurrency, requests_per_second):
+    """Scrape the range once in a fresh output directory and return the metrics summary"""
+    output_dir = tempfile.mkdtemp(prefix=f"bench_{mode}_")
+    try:
+        scraper = CanadaGeneralScraper(
+            requests_per_second=requests_per_second,
+            burst=concurrency,
+            max_retries=6,
+            backoff_base=0.05,
+            base_url=base_url,
+            output_dir=output_dir,
+        )
+        if not scraper.login("benchmark", "benchmark"):
+            raise RuntimeError("Login to the mock server failed")
+
+        if mode == "serial":
+            return scraper.scrape_data(start_date, end_date)
+        if mode == "concurrent":
+            return scraper.scrape_data(start_date, end_date, concurrency=concurrency)
+        if mode == "adaptive":
+            return scraper.scrape_data_adaptive(start_date, end_date, max_records=2000)
+        raise ValueError(f"Unknown mode {mode!r}")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages, one per mode that slowed down"""
+    regressions = []
+    for mode, summary in results.items():
+        previous = baseline.get(mode)
+        if not previous or not previous.get("records_per_sec"):
+            continue
+        ratio = summary["records_per_sec"] / previous["records_per_sec"]
+        if ratio < 1 - tolerance:
+            regressions.append(
+                f"{mode}: {summary['records_per_sec']:,.0f} records/s vs "
+                f"{previous['records_per_sec']:,.0f} baseline ({ratio:.0%})"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against the mock server")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--start", default="2019-01-01")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--contracts-per-day", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests-per-second", type=float, default=1000.0,
+                        help="high by default so the engine, not the limiter, is measured")
+    parser.add_argument("--modes", default="serial,concurrent,adaptive")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--save-baseline", help="write this run's results to a JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed fractional throughput drop before failing")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, contracts_per_day=args.contracts_per_day,
+                        error_rate=args.error_rate)
+    server, base_url = start_server(config)
+
+    start_date = args.start
+    end_date = (date.fromisoformat(start_date) + timedelta(days=args.days - 1)).isoformat()
+
+    results = {}
+    try:
+        for mode in args.modes.split(","):
+            print(f"\nRunning {mode} scrape of {start_date} to {end_date}...")
+            results[mode] = run_mode(mode, base_url, start_date, end_date,
+                                     args.concurrency, args.requests_per_second)
+    finally:
+        server.shutdown()
+
+    print("\nScraper Benchmark")
+    print("-" * 80)
+    print(f"{'mode':<12}{'records':>10}{'requests':>10}{'elapsed s':>11}"
+          f"{'records/s':>12}{'p50 s':>9}{'p95 s':>9}")
+    for mode, summary in results.items():
+        print(f"{mode:<12}{summary['records']:>10}{summary['requests']:>10}"
+              f"{summary['elapsed']:>11.2f}{summary['records_per_sec']:>12,.0f}"
+              f"{summary['latency_p50'] or 0:>9.3f}{summary['latency_p95'] or 0:>9.3f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nThroughput regressions:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print("\nNo throughput regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Reading and writing scraped contract window files.
+
+The scraper stores each date window as contracts_<from>_to_<to><suffix>, and
+each batch fetched by sync_updates as contracts_updates_<timestamp><suffix>:
+
+    .json         indented JSON array (the original format)
+    .ndjson       one contract per line
+    .ndjson.gz    gzip-compressed NDJSON (the default)
+    .ndjson.zst   zstd-compressed NDJSON, needs the optional zstandard package
+
+NDJSON files can be read one contract at a time, so loaders never need to hold
+a whole window in memory. Parsing uses orjson when it is installed.
+"""
+import gzip
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:  # zstd output is optional
+    zstandard = None
+
+try:
+    import orjson
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers
+    # catch the same exception either way
+    json_loads = orjson.loads
+except ImportError:  # faster parsing is optional
+    json_loads = json.loads
+
+FORMATS = {
+    "json": ".json",
+    "ndjson": ".ndjson",
+    "ndjson.gz": ".ndjson.gz",
+    "ndjson.zst": ".ndjson.zst",
+}
+
+# Longest suffixes first so ".ndjson.gz" is not mistaken for ".gz"
+SUFFIXES = sorted(FORMATS.values(), key=len, reverse=True)
+
+def window_filename(from_date, to_date, output_format="ndjson.gz"):
+    """Return the file name for one scraped window"""
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}; expected one of {', '.join(FORMATS)}")
+    return f"contracts_{from_date}_to_{to_date}{FORMATS[output_format]}"
+
+def updates_filename(synced_at, output_format="ndjson.gz"):
+    """
+    Return the file name for one sync_updates batch, synced at the given datetime
+
+    The name sorts after every window file, so a contract re-fetched at the
+    same updated_at is taken from the sync, like the store does.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}; expected one of {', '.join(FORMATS)}")
+    return f"contracts_updates_{synced_at:%Y%m%dT%H%M%S%f}{FORMATS[output_format]}"
+
+def file_suffix(filename):
+    """Return the contract file suffix of filename, or None"""
+    for suffix in SUFFIXES:
+        if filename.endswith(suffix):
+            return suffix
+    return None
+
+def is_contract_file(filename):
+    """True for window files written by the scraper, in any format"""
+    return filename.startswith("contracts_") and file_suffix(filename) is not None
+
+def list_contract_files(directory):
+    """Return the paths of all contract files in directory, in name order"""
+    return [
+        os.path.join(directory, filename)
+        for filename in sorted(os.listdir(directory))
+        if is_contract_file(filename)
+    ]
+
+def open_text(path, mode="r"):
+    """Open a contract file as text, compressing or decompressing by suffix"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required for .zst files: pip install zstandard")
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def write_records(path, records):
+    """
+    Write records to path in the format implied by its suffix
+
+    The file is written under a temporary name and renamed into place, so a
+    crash never leaves a truncated window behind. Returns the record count.
+    """
+    # Keep the suffix so open_text picks the same compression for the temp file
+    directory, filename = os.path.split(path)
+    tmp_path = os.path.join(directory, f".tmp-{filename}")
+    count = 0
+    with open_text(tmp_path, "w") as f:
+        if file_suffix(path) == ".json":
+            records = list(records)
+            json.dump(records, f, indent=4)
+            count = len(records)
+        else:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")))
+                f.write("\n")
+                count += 1
+    os.replace(tmp_path, path)
+    return count
+
+def iter_records(path):
+    """Yield the contracts stored in one file, one at a time for NDJSON files"""
+    with open_text(path) as f:
+        if file_suffix(path) == ".json":
+            data = json_loads(f.read())
+            if isinstance(data, list):
+                yield from data
+            else:
+                yield data
+            return
+
+        for line in f:
+            if line.strip():
+                yield json_loads(line)
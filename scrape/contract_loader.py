@@ -0,0 +1,301 @@
+"""Shared loaders for the analysis scripts.
+
+load_contracts returns scraped contracts as dicts, deduplicated by id through
+the local ContractStore. iter_contracts and iter_contract_batches yield the
+same contracts one at a time or in small batches, so an analysis that makes a
+single pass runs in flat memory however long the scrape history is.
+
+load_contract_frame returns them as a pandas DataFrame backed by a columnar
+Parquet cache in scraped_data/.parquet_cache/. Each window file is converted
+once and its cache entry is rebuilt only when the file's size or mtime changes,
+so repeat runs read compact columns instead of re-parsing JSON. Nested
+product, vehicle and customer objects are flattened into prefixed columns
+(product_type, vehicle_make, customer_province, ...); lists such as claims
+are kept as JSON text, with claims_count alongside.
+
+load_typed_frame returns the same frame with compact dtypes: money as integer
+cents (contract_price, tax and total become *_cents columns) and every integer
+column in the smallest dtype that fits, timestamps as datetimes, booleans as
+booleans and low-cardinality text as categoricals. memory_report prints what
+each column costs.
+
+Both loaders parse window files across a process pool (one worker per core by
+default). Workers send back compact results, row tuples for the store and
+nothing but a row count for the Parquet cache, which they write themselves,
+instead of pickling lists of dicts to the parent.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from contract_files import iter_records, list_contract_files
+from contract_store import ContractStore
+
+CACHE_DIR = ".parquet_cache"
+NESTED_FIELDS = ("product", "vehicle", "customer")
+
+# Money fields the API already sends in cents, and those it sends in dollars
+CENTS_COLUMNS = ("product_dealer_cost", "product_claim_amount", "subtotal")
+DOLLAR_COLUMNS = ("contract_price", "tax", "total")
+DATE_SUFFIXES = ("_at", "_date")
+INT_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_RATIO = 0.5
+
+def default_workers():
+    return os.cpu_count() or 1
+
+def load_contracts(directory, workers=None):
+    """Load all contracts from the specified directory, deduplicated by id."""
+    with ContractStore(os.path.join(directory, "contracts.sqlite")) as store:
+        store.import_directory(directory, workers or default_workers())
+        return list(store.iter_contracts())
+
+def iter_contracts(directory, deduplicate=True, workers=None):
+    """
+    Yield contracts one at a time
+
+    By default new window files are first merged into the store and contracts
+    are streamed from it, each once. With deduplicate=False they are streamed
+    straight from the window files instead, in file order, duplicates included.
+    """
+    if not deduplicate:
+        for file_path in list_contract_files(directory):
+            try:
+                yield from iter_records(file_path)
+            except (json.JSONDecodeError, EOFError, OSError):
+                print(f"Error reading {os.path.basename(file_path)}")
+        return
+
+    with ContractStore(os.path.join(directory, "contracts.sqlite")) as store:
+        store.import_directory(directory, workers or default_workers())
+        yield from store.iter_contracts()
+
+def iter_contract_batches(directory, batch_size=1000, **kwargs):
+    """Yield lists of up to batch_size contracts; see iter_contracts"""
+    batch = []
+    for contract in iter_contracts(directory, **kwargs):
+        batch.append(contract)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _scalar(value):
+    """Keep scalars as they are; nested structures become JSON text"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+def flatten_contract(contract):
+    """Flatten one contract into a single-level row of columns"""
+    row = {}
+    for key, value in contract.items():
+        if key in NESTED_FIELDS and isinstance(value, dict):
+            for field, nested_value in value.items():
+                row[f"{key}_{field}"] = _scalar(nested_value)
+        else:
+            row[key] = _scalar(value)
+    row["claims_count"] = len(contract.get("claims") or [])
+    return row
+
+def _frame_from_records(records):
+    df = pd.DataFrame([flatten_contract(record) for record in records])
+    # Parquet needs one type per column; the API is not always consistent
+    # (e.g. term_months as "84" or 84), so mixed columns are stored as text
+    for column in df.columns:
+        if df[column].dtype == object:
+            types = {type(value) for value in df[column].dropna()}
+            if len(types) > 1:
+                df[column] = df[column].map(lambda value: None if value is None else str(value))
+    return df
+
+def _convert_file(source_path, cache_path):
+    """Process-pool task: convert one window file to Parquet and return its row count"""
+    try:
+        df = _frame_from_records(iter_records(source_path))
+        df.to_parquet(cache_path, index=False)
+        return len(df), None
+    except (json.JSONDecodeError, EOFError, OSError) as e:
+        return None, str(e)
+
+class ParquetCache:
+    """Per-window-file Parquet cache, invalidated by source size and mtime"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.cache_dir = os.path.join(directory, CACHE_DIR)
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def _cache_path(self, source_path):
+        return os.path.join(self.cache_dir, os.path.basename(source_path) + ".parquet")
+
+    def refresh(self, workers=1):
+        """Convert new or modified window files and drop entries whose source is gone"""
+        sources = list_contract_files(self.directory)
+        stale = []
+        for source_path in sources:
+            stat = os.stat(source_path)
+            entry = self.index.get(os.path.basename(source_path))
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                continue
+            stale.append((source_path, stat))
+
+        tasks = [(source_path, self._cache_path(source_path)) for source_path, _ in stale]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_convert_file, *zip(*tasks), chunksize=4))
+        else:
+            results = [_convert_file(*task) for task in tasks]
+
+        converted = 0
+        for (source_path, stat), (rows, error) in zip(stale, results):
+            name = os.path.basename(source_path)
+            if error is not None:
+                print(f"Error reading {name}")
+                continue
+            self.index[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "rows": rows}
+            converted += 1
+
+        current = {os.path.basename(path) for path in sources}
+        removed = set(self.index) - current
+        for name in removed:
+            del self.index[name]
+            cache_path = os.path.join(self.cache_dir, name + ".parquet")
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+
+        if converted or removed:
+            self._save_index()
+        return converted
+
+    def cached_paths(self):
+        return [
+            os.path.join(self.cache_dir, name + ".parquet")
+            for name, entry in sorted(self.index.items())
+            if entry["rows"]
+        ]
+
+def load_contract_frame(directory, columns=None, workers=None):
+    """
+    Load all contracts as a flattened DataFrame through the Parquet cache
+
+    `columns` limits the columns read from the cache. Contracts that appear in
+    several windows are kept once, in their latest updated_at version.
+    """
+    cache = ParquetCache(directory)
+    converted = cache.refresh(workers or default_workers())
+    if converted:
+        print(f"Cached {converted} new or modified files as Parquet")
+
+    paths = cache.cached_paths()
+    if not paths:
+        return pd.DataFrame()
+
+    if columns is not None:
+        columns = list(dict.fromkeys(["id", "updated_at", *columns]))
+    frames = []
+    for path in paths:
+        if columns is None:
+            frames.append(pd.read_parquet(path))
+        else:
+            # Window files do not all share every column
+            available = set(pq.read_schema(path).names)
+            frames.append(pd.read_parquet(path, columns=[c for c in columns if c in available]))
+    df = pd.concat(frames, ignore_index=True)
+
+    if "id" in df.columns:
+        if "updated_at" in df.columns:
+            df = df.sort_values("updated_at", kind="stable", na_position="first")
+        df = df.drop_duplicates("id", keep="last").sort_values("id").reset_index(drop=True)
+    return df
+
+def smallest_int(series):
+    """
+    Cast integral values to the smallest integer dtype that holds them
+
+    Columns with missing values get the matching nullable dtype (Int16, ...).
+    """
+    values = series.dropna()
+    if values.empty:
+        return series
+    low, high = values.min(), values.max()
+    dtype = next(t for t in INT_DTYPES if np.iinfo(t).min <= low and high <= np.iinfo(t).max)
+    if len(values) < len(series):
+        return series.astype(np.dtype(dtype).name.capitalize())
+    return series.astype(dtype)
+
+def _is_integral(values):
+    return pd.api.types.is_integer_dtype(values) or (
+        pd.api.types.is_float_dtype(values) and bool((values % 1 == 0).all())
+    )
+
+def typed_frame(df):
+    """Return a copy of a flattened contract frame with compact dtypes; see load_typed_frame"""
+    df = df.copy()
+    for column in list(df.columns):
+        series = df[column]
+        values = series.dropna()
+
+        if column in DOLLAR_COLUMNS:
+            cents = (pd.to_numeric(series, errors="coerce") * 100).round()
+            df.insert(df.columns.get_loc(column), f"{column}_cents", smallest_int(cents))
+            del df[column]
+        elif column in CENTS_COLUMNS:
+            df[column] = smallest_int(pd.to_numeric(series, errors="coerce").round())
+        elif column.endswith(DATE_SUFFIXES):
+            df[column] = pd.to_datetime(series, errors="coerce", utc=True, format="ISO8601")
+        elif values.empty:
+            continue
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            if _is_integral(values):
+                df[column] = smallest_int(series)
+        elif series.dtype == object and values.map(type).eq(bool).all():
+            df[column] = series.astype("boolean")
+        elif pd.api.types.is_string_dtype(series) or series.dtype == object:
+            if values.nunique() <= CATEGORY_RATIO * len(series):
+                df[column] = series.astype("category")
+    return df
+
+def load_typed_frame(directory, columns=None, workers=None):
+    """
+    Load contracts as a flattened, memory-lean DataFrame
+
+    Money fields are integer cents in the smallest integer dtype that fits
+    (contract_price, tax and total are converted from dollars into
+    contract_price_cents, tax_cents and total_cents), other integers are
+    downcast the same way, *_at and *_date columns are datetimes and text
+    columns with few distinct values are categoricals.
+    """
+    return typed_frame(load_contract_frame(directory, columns=columns, workers=workers))
+
+def memory_report(df, baseline=None):
+    """Print each column's dtype and memory, largest first, and the total against `baseline`"""
+    usage = df.memory_usage(deep=True, index=False).sort_values(ascending=False)
+    total = int(usage.sum())
+
+    print("\nMemory Usage:")
+    print("-" * 80)
+    print(f"{'column':<32}{'dtype':<22}{'MB':>10}{'share':>10}")
+    for column, size in usage.items():
+        print(f"{column:<32}{str(df[column].dtype):<22}{size / 1e6:>10.2f}{size / total:>10.1%}")
+    print(f"{'total':<54}{total / 1e6:>10.2f}")
+    if baseline is not None:
+        baseline_total = int(baseline.memory_usage(deep=True, index=False).sum())
+        print(f"Untyped frame: {baseline_total / 1e6:.2f} MB ({baseline_total / total:.1f}x larger)")
@@ -0,0 +1,204 @@
+"""Local store holding the latest version of every scraped contract.
+
+Window files are an append-only record of what each request returned; the
+store merges them by contract id so a contract that changed after it was first
+scraped (status, claims, completed_at) is kept once, in its newest version.
+It is a single SQLite file, so it needs no server and survives crashes.
+
+Each contract is stored with a hash of its canonical JSON, so re-importing an
+overlapping or re-scraped window only writes contracts that actually changed,
+and window files already imported (same size and mtime) are not parsed again.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from contract_files import iter_records, list_contract_files
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    id INTEGER PRIMARY KEY,
+    updated_at TEXT,
+    content_hash TEXT,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS source_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    records INTEGER NOT NULL
+);
+"""
+
+def canonical_json(contract):
+    """Serialize a contract with sorted keys so equal contracts give equal text"""
+    return json.dumps(contract, sort_keys=True, separators=(",", ":"))
+
+def content_hash(body):
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+def prepare_rows(contracts):
+    """Turn contracts into (id, updated_at, content_hash, body) rows for upsert_rows"""
+    rows = []
+    for contract in contracts:
+        if contract.get("id") is None:
+            continue
+        body = canonical_json(contract)
+        rows.append((contract["id"], contract.get("updated_at"), content_hash(body), body))
+    return rows
+
+def _read_file_rows(path):
+    """Process-pool task: parse one window file into compact row tuples
+
+    Returning strings rather than dicts keeps the result cheap to send back
+    to the parent process.
+    """
+    try:
+        return path, prepare_rows(iter_records(path)), None
+    except (json.JSONDecodeError, EOFError, OSError) as e:
+        return path, None, str(e)
+
+class ContractStore:
+    def __init__(self, path):
+        self.path = path
+        # Backfill workers write to the same store; wait out each other's locks
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.executescript(SCHEMA)
+
+        # Stores created before content hashing lack the column
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(contracts)")]
+        if "content_hash" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE contracts ADD COLUMN content_hash TEXT")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM contracts").fetchone()[0]
+
+    def upsert(self, contracts):
+        """
+        Merge contracts into the store by id and return how many rows changed
+
+        Contracts identical to the stored version (same content hash) are
+        skipped, and a stored contract is only replaced by a version whose
+        updated_at is the same or newer, so replaying an old window never
+        undoes a later change.
+        """
+        return self.upsert_rows(prepare_rows(contracts))
+
+    def upsert_rows(self, rows):
+        """Like upsert, for rows already built by prepare_rows"""
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO contracts (id, updated_at, content_hash, body) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    content_hash = excluded.content_hash,
+                    body = excluded.body
+                WHERE contracts.content_hash IS NOT excluded.content_hash
+                  AND (contracts.updated_at IS NULL
+                       OR excluded.updated_at IS NULL
+                       OR excluded.updated_at >= contracts.updated_at)
+                """,
+                rows,
+            )
+        return self.conn.total_changes - before
+
+    def _is_imported(self, path):
+        """True if path was imported before with the same size and mtime"""
+        stat = os.stat(path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns FROM source_files WHERE path = ?", (os.path.abspath(path),)
+        ).fetchone()
+        return row == (stat.st_size, stat.st_mtime_ns)
+
+    def _mark_imported(self, path, records):
+        stat = os.stat(path)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO source_files (path, size, mtime_ns, records) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET size = excluded.size, "
+                "mtime_ns = excluded.mtime_ns, records = excluded.records",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, records),
+            )
+
+    def import_file(self, path):
+        """
+        Merge one window file into the store unless it was imported unchanged before
+
+        Returns the number of contracts that changed, or None if the file was skipped.
+        """
+        if self._is_imported(path):
+            return None
+
+        rows = prepare_rows(iter_records(path))
+        changed = self.upsert_rows(rows)
+        self._mark_imported(path, len(rows))
+        return changed
+
+    def import_directory(self, directory, workers=1):
+        """
+        Merge every new or modified window file in directory
+
+        With workers > 1 the files are parsed and hashed in a process pool and
+        only the compact row tuples come back; SQLite writes stay in this
+        process, in file order. Returns (files read, contracts changed).
+        """
+        pending = [path for path in list_contract_files(directory) if not self._is_imported(path)]
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(_read_file_rows, pending, chunksize=4)
+                return self._apply_results(results)
+        return self._apply_results(_read_file_rows(path) for path in pending)
+
+    def _apply_results(self, results):
+        files_read = 0
+        changed = 0
+        for path, rows, error in results:
+            if error is not None:
+                print(f"Error reading {os.path.basename(path)}")
+                continue
+            changed += self.upsert_rows(rows)
+            self._mark_imported(path, len(rows))
+            files_read += 1
+        return files_read, changed
+
+    def get(self, contract_id):
+        row = self.conn.execute("SELECT body FROM contracts WHERE id = ?", (contract_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_contracts(self):
+        """Yield every stored contract in id order"""
+        for (body,) in self.conn.execute("SELECT body FROM contracts ORDER BY id"):
+            yield json.loads(body)
+
+    def max_updated_at(self):
+        return self.conn.execute("SELECT MAX(updated_at) FROM contracts").fetchone()[0]
+
+    def get_state(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
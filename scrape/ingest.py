@@ -0,0 +1,162 @@
+"""Bulk-load scraped contracts into Postgres.
+
+Contracts are validated against the pydantic models in src/models, split into
+the products, vehicles, dealerships, contracts, customers and claims tables
+from src/tables.py (see star_schema.py), and upserted in batches of multi-row
+INSERT ... ON CONFLICT statements, so re-running a load updates rows in place.
+A contract or claim is only replaced by a version with the same or a newer
+updated_at, as in the local store, so loading an old window never undoes a
+later change.
+
+By default new window files are merged into scraped_data/contracts.sqlite first
+and each contract is loaded once, in its newest version.
+
+    python ingest.py                      # the merged store, after importing new files
+    python ingest.py --files              # every window file as written, in name order
+    python ingest.py --batch-size 10000
+
+The loader can also be fed live while scraping:
+
+    loader = PostgresLoader(engine)
+    scraper.record_callbacks.append(loader.add)
+    scraper.scrape_data(start_date, end_date)
+    loader.close()
+"""
+import argparse
+import os
+import time
+
+from pydantic import ValidationError
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+
+from contract_files import iter_records, list_contract_files
+from contract_loader import default_workers
+from contract_store import ContractStore
+from src.database import engine
+from src.models import Contract
+from src.tables import metadata, contracts
+from star_schema import LOAD_ORDER, primary_key, split_contract
+
+# Postgres allows at most 65535 bind parameters per statement
+MAX_PARAMETERS = 65535
+ROWS_PER_STATEMENT = 1000
+
+def _is_newer(updated_at, current):
+    """Same rule as ContractStore.upsert: a missing updated_at never loses"""
+    return current is None or updated_at is None or updated_at >= current
+
+def _upsert(table, rows):
+    """
+    One multi-row INSERT ... ON CONFLICT (pk) DO UPDATE for every non-key column
+
+    Tables with updated_at keep the stored row when it is newer than the
+    incoming one.
+    """
+    stmt = insert(table).values(rows)
+    key_columns = [column.name for column in table.primary_key.columns]
+    where = None
+    if "updated_at" in table.c:
+        where = or_(
+            table.c.updated_at.is_(None),
+            stmt.excluded.updated_at.is_(None),
+            stmt.excluded.updated_at >= table.c.updated_at,
+        )
+    return stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={
+            column.name: stmt.excluded[column.name]
+            for column in table.columns
+            if column.name not in key_columns
+        },
+        where=where,
+    )
+
+class PostgresLoader:
+    """Validate scraped contracts and upsert them into Postgres in batches"""
+    def __init__(self, engine, batch_size=5000, create_tables=True):
+        self.engine = engine
+        self.batch_size = batch_size
+        if create_tables:
+            metadata.create_all(engine)
+
+        self.rows_per_statement = {
+            table: min(ROWS_PER_STATEMENT, MAX_PARAMETERS // len(table.columns)) for table in LOAD_ORDER
+        }
+        # Rows waiting for the next flush, keyed by primary key: Postgres
+        # rejects an upsert that touches the same row twice in one statement
+        self.pending = {table: {} for table in LOAD_ORDER}
+        # updated_at of each pending contract
+        self.versions = {}
+        self.loaded = 0
+        self.invalid = 0
+        self.started = time.perf_counter()
+
+    def add(self, records):
+        """Validate and queue records, flushing whenever a batch fills up"""
+        for record in records:
+            try:
+                contract = Contract.model_validate(record)
+            except ValidationError as e:
+                self.invalid += 1
+                if self.invalid <= 10:
+                    print(f"Skipping invalid contract {record.get('id')}: "
+                          f"{e.error_count()} errors, first: {e.errors()[0]['loc']} {e.errors()[0]['msg']}")
+                continue
+
+            # A stale version queued after a newer one is dropped with its children
+            if contract.id in self.versions and not _is_newer(contract.updated_at, self.versions[contract.id]):
+                continue
+            self.versions[contract.id] = contract.updated_at
+
+            for table, rows in split_contract(contract).items():
+                for row in rows:
+                    self.pending[table][primary_key(table, row)] = row
+
+            if len(self.pending[contracts]) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Write every pending row in one transaction, many rows per statement"""
+        if not self.pending[contracts]:
+            return
+
+        with self.engine.begin() as conn:
+            for table in LOAD_ORDER:
+                rows = list(self.pending[table].values())
+                size = self.rows_per_statement[table]
+                for start in range(0, len(rows), size):
+                    conn.execute(_upsert(table, rows[start:start + size]))
+
+        self.loaded += len(self.pending[contracts])
+        self.pending = {table: {} for table in LOAD_ORDER}
+        self.versions = {}
+        elapsed = time.perf_counter() - self.started
+        print(f"Loaded {self.loaded} contracts ({self.loaded / elapsed:,.0f}/s)")
+
+    def close(self):
+        self.flush()
+        elapsed = time.perf_counter() - self.started
+        print(f"Finished: {self.loaded} contracts loaded, {self.invalid} invalid, "
+              f"in {elapsed:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load scraped contracts into Postgres")
+    parser.add_argument("--directory", default="scraped_data")
+    parser.add_argument("--files", action="store_true",
+                        help="load every window file as written instead of the merged store")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    loader = PostgresLoader(engine, batch_size=args.batch_size)
+    if args.files:
+        for file_path in list_contract_files(args.directory):
+            loader.add(iter_records(file_path))
+    else:
+        with ContractStore(os.path.join(args.directory, "contracts.sqlite")) as store:
+            store.import_directory(args.directory, default_workers())
+            loader.add(store.iter_contracts())
+    loader.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Local stand-in for the Canada General portal, for offline scraper benchmarks.
+
+Implements the two endpoints CanadaGeneralScraper talks to:
+
+    GET/POST /login          form login; a successful POST sets a session
+                             cookie and redirects away from /login
+    GET /search/contracts    ?from=YYYY-MM-DD&to=YYYY-MM-DD, or ?updated_since=<ISO timestamp>
+
+Responses are JSON arrays of synthetic contracts shaped like src.models.Contract.
+Contracts are generated deterministically from the date and a seed, so every
+run of a benchmark sees the same data. Latency, payload size and error rate are
+configurable:
+
+    python mock_server.py --port 8000 --latency 0.2 --contracts-per-day 80 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SESSION_COOKIE = "cgw_session"
+
+VEHICLES = {
+    "Hyundai": ["Elantra", "Tucson", "Santa Fe", "Kona", "Accent"],
+    "Ford": ["F-150", "Escape", "Explorer", "Focus", "Edge"],
+    "Nissan": ["Rogue", "Sentra", "Altima", "Pathfinder", "Kicks"],
+    "Kia": ["Forte", "Sportage", "Sorento", "Soul", "Seltos"],
+    "Chevrolet": ["Silverado", "Equinox", "Malibu", "Cruze", "Traverse"],
+    "Honda": ["Civic", "Accord", "CR-V", "Pilot", "Fit"],
+    "Toyota": ["Corolla", "RAV4", "Camry", "Tacoma", "Highlander"],
+}
+
+WARRANTY_PRODUCTS = [
+    ("Principal", "24 month", "Unlimited km", 65900, 250000),
+    ("Principal", "12 month", "40000 km", 42900, 150000),
+    ("Pinnacle", "No Time Limit", "Unlimited km", 129900, 500000),
+    ("Pinnacle", "48 month", "80000 km", 99900, 400000),
+    ("Powertrain", "24 month", "40000 km", 39900, 100000),
+]
+
+GAP_TERMS = [60, 72, 84, 84, 84, 96]
+
+PROTECTION_PRODUCTS = [
+    ("Paint/Interior/Rust", "CAPP-C", "App\\Products\\Protection\\PaintInteriorRustProduct", 49900),
+    ("Theft Protection", "CATP", "App\\Products\\Protection\\TheftProduct", 29900),
+    ("Tire and Wheel", "CATW", "App\\Products\\Protection\\TireWheelProduct", 59900),
+]
+
+DEALERSHIPS = [(101, "ABC Motors"), (102, "XYZ Auto"), (103, "123 Cars"),
+               (104, "Northern Hyundai"), (105, "Lakeshore Ford")]
+
+PEOPLE = ["John Smith", "Jane Doe", "Bob Wilson", "Priya Patel", "Luc Tremblay"]
+
+EPOCH = date(2017, 1, 1)
+
+def _timestamp(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _vin(rng):
+    return "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ0123456789") for _ in range(17))
+
+def _postal_code(rng):
+    letters = "ABCEGHJKLMNPRSTVXY"
+    return (f"{rng.choice(letters)}{rng.randint(0, 9)}{rng.choice(letters)} "
+            f"{rng.randint(0, 9)}{rng.choice(letters)}{rng.randint(0, 9)}")
+
+def _product(rng, created):
+    kind = rng.random()
+    if kind < 0.6:
+        product_type, term, distance, dealer_cost, claim_amount = rng.choice(WARRANTY_PRODUCTS)
+        sku = f"1{product_type[:2].upper()}{term.split()[0][:2].upper()}{distance.split()[0][:3].upper()}"
+        return "Warranty", "App\\Contracts\\Warranty\\WarrantyContract", {
+            "name": f"{product_type.upper()} - {term} / {distance}",
+            "type": product_type,
+            "term": term,
+            "distance": distance,
+            "dealer_cost": dealer_cost,
+            "claim_amount": claim_amount,
+            "max_model_years": 15,
+            "max_model_km": 210000,
+            "commercial_eligible": False,
+            "sku": sku,
+            "sku_type": "App\\Products\\Warranty\\CGWWarrantyProduct",
+            "created_at": created,
+        }
+    if kind < 0.9:
+        term_months = rng.choice(GAP_TERMS)
+        double_gap = rng.random() < 0.02
+        return "GAP", "App\\Contracts\\GAP\\GAPContract", {
+            "name": f"{'Double' if double_gap else 'Standard'} GAP {term_months} months",
+            "type": "GAP",
+            "term_months": term_months,
+            "dealer_cost": 35900 + term_months * 100,
+            "double_gap": double_gap,
+            "max_model_years": 7,
+            "sku": f"{'D' if double_gap else ''}GAP{term_months}",
+            "sku_type": "App\\Products\\GAP\\CGWGAPProduct",
+            "created_at": created,
+        }
+    product_type, sku, sku_type, dealer_cost = rng.choice(PROTECTION_PRODUCTS)
+    return "Protection", "App\\Contracts\\Protection\\ProtectionContract", {
+        "name": product_type,
+        "type": product_type,
+        "dealer_cost": dealer_cost,
+        "max_model_years": 7,
+        "sku": sku,
+        "sku_type": sku_type,
+        "created_at": created,
+    }
+
+def make_contract(contract_id, day, seed=0):
+    """Build one synthetic contract created on `day`, deterministic in (contract_id, seed)"""
+    rng = random.Random(contract_id * 7919 + seed)
+    created_at = datetime(day.year, day.month, day.day) + timedelta(seconds=rng.randint(8 * 3600, 20 * 3600))
+    created = _timestamp(created_at)
+    contract_type, model_class, product = _product(rng, created)
+    make = rng.choice(list(VEHICLES))
+    year = rng.randint(max(2003, day.year - 12), day.year + 1)
+    dealership_id, dealership = rng.choice(DEALERSHIPS)
+    price = round(product["dealer_cost"] / 100 * rng.uniform(1.2, 2.0), 2)
+    tax = round(price * 0.13, 2)
+    status = rng.choice(["active", "active", "active", "pending", "void"])
+    # Contracts keep changing after they are sold; updated_at trails created_at
+    updated_at = created_at + timedelta(days=rng.randint(0, 60), seconds=rng.randint(0, 86399))
+    first_name, last_name = rng.choice(PEOPLE).split()
+
+    claims = []
+    if status == "active" and rng.random() < 0.1:
+        claims.append({
+            "id": contract_id * 10 + 1,
+            "contract_id": contract_id,
+            "repair_facility_name": "AutoFix Shop",
+            "km_at_claim_time": rng.randint(10000, 150000),
+            "labour_price": rng.randint(5000, 60000),
+            "parts_price": rng.randint(5000, 120000),
+            "tax_price": rng.randint(1000, 20000),
+            "other_price": 0,
+            "status": rng.choice(["pending", "open", "closed"]),
+            "type": "regular",
+            "created_at": _timestamp(updated_at),
+        })
+
+    return {
+        "id": contract_id,
+        "contract_number": str(100000 + contract_id),
+        "prefixed_contract_number": f"{contract_type[0]}-{100000 + contract_id}",
+        "status": status,
+        "model_class": model_class,
+        "contract_type": contract_type,
+        "product": product,
+        "customer": {
+            "first_name": first_name,
+            "last_name": last_name,
+            "address1": f"{rng.randint(1, 9999)} Main St",
+            "city": "Toronto",
+            "province": "ON",
+            "postal_code": _postal_code(rng),
+            "phone": f"416-555-{rng.randint(0, 9999):04d}",
+            "email": f"{first_name.lower()}.{last_name.lower()}{contract_id}@example.com",
+        },
+        "vehicle": {
+            "vin": _vin(rng),
+            "make": make,
+            "model": rng.choice(VEHICLES[make]),
+            "year": year,
+            "delivery_date": created,
+            "in_service_date": created,
+            "odometer": rng.randint(0, 180000),
+            "odometer_unit": "km",
+            "transmission": rng.choice(["Automatic", "Manual"]),
+            "num_cylinders": rng.choice([4, 4, 6, 8]),
+            "vehicle_usage": "commercial" if rng.random() < 0.05 else "personal",
+        },
+        "contract_price": price,
+        "tax": tax,
+        "total": round(price + tax, 2),
+        "subtotal": int(round(price * 100)),
+        "claims": claims,
+        "completed_at": _timestamp(created_at + timedelta(days=1)) if status == "active" else None,
+        "creator": rng.choice(PEOPLE),
+        "salesperson": rng.choice(PEOPLE),
+        "account_admin": "Admin User",
+        "dealership": dealership,
+        "dealership_id": dealership_id,
+        "pdf_url": f"/{contract_type.lower()}-contracts/{contract_id}/pdf",
+        "claims_url": f"{contract_type.lower()}-contracts/{contract_id}/claims",
+        "created_at": created,
+        "updated_at": _timestamp(updated_at),
+    }
+
+class MockConfig:
+    def __init__(self, latency=0.05, latency_jitter=0.5, contracts_per_day=50,
+                 error_rate=0.0, seed=0, history_end=None, max_ids_per_day=10000):
+        self.latency = latency                # mean seconds per search request
+        self.latency_jitter = latency_jitter  # +/- fraction of the mean
+        self.contracts_per_day = contracts_per_day
+        self.error_rate = error_rate          # fraction of searches answered with 503
+        self.seed = seed
+        self.history_end = history_end or date.today()
+        self.max_ids_per_day = max_ids_per_day
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def contracts_on(self, day):
+        """Contracts created on one day; volume varies with the day but is deterministic"""
+        day_index = (day - EPOCH).days
+        volume_rng = random.Random(day_index * 104729 + self.seed)
+        count = int(self.contracts_per_day * volume_rng.uniform(0.5, 1.5))
+        if day.weekday() == 6:
+            count //= 4
+        first_id = day_index * self.max_ids_per_day + 1
+        return [make_contract(first_id + i, day, self.seed) for i in range(count)]
+
+class MockHandler(BaseHTTPRequestHandler):
+    config = MockConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _logged_in(self):
+        return f"{SESSION_COOKIE}=" in self.headers.get("Cookie", "")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if urlparse(self.path).path != "/login":
+            return self._send(404)
+        if not form.get("username") or not form.get("password"):
+            return self._send(200, b"<form>login</form>", "text/html")
+        self._send(302, headers={
+            "Location": "/dashboard",
+            "Set-Cookie": f"{SESSION_COOKIE}={random.getrandbits(64):x}; Path=/",
+        })
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path in ("/login", "/dashboard"):
+            return self._send(200, f"<html>{url.path}</html>".encode(), "text/html")
+        if url.path != "/search/contracts":
+            return self._send(404)
+        if not self._logged_in():
+            return self._send(401, b'{"error": "unauthenticated"}')
+
+        config = self.config
+        jitter = 1 + config.latency_jitter * (2 * config.random() - 1)
+        time.sleep(max(0.0, config.latency * jitter))
+        if config.random() < config.error_rate:
+            return self._send(503, b'{"error": "service unavailable"}')
+
+        query = parse_qs(url.query)
+        try:
+            if "updated_since" in query:
+                contracts = self._updated_since(query["updated_since"][0])
+            else:
+                from_day = date.fromisoformat(query["from"][0])
+                to_day = date.fromisoformat(query["to"][0])
+                contracts = []
+                day = from_day
+                while day <= to_day:
+                    contracts.extend(config.contracts_on(day))
+                    day += timedelta(days=1)
+        except (KeyError, ValueError) as e:
+            return self._send(400, json.dumps({"error": str(e)}).encode())
+
+        self._send(200, json.dumps(contracts).encode())
+
+    def _updated_since(self, since):
+        since_time = datetime.fromisoformat(since.replace("Z", "+00:00")).replace(tzinfo=None)
+        # updated_at trails created_at by at most 61 days in make_contract
+        day = since_time.date() - timedelta(days=61)
+        contracts = []
+        while day <= self.config.history_end:
+            for contract in self.config.contracts_on(day):
+                updated_at = datetime.strptime(contract["updated_at"], "%Y-%m-%dT%H:%M:%SZ")
+                if updated_at >= since_time:
+                    contracts.append(contract)
+            day += timedelta(days=1)
+        return contracts
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Start the mock server on a background thread; returns (server, base_url)"""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"config": config or MockConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic Canada General contracts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--contracts-per-day", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, contracts_per_day=args.contracts_per_day,
+                        error_rate=args.error_rate, seed=args.seed)
+    server, base_url = start_server(config, args.host, args.port)
+    print(f"Mock Canada General server on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Ad-hoc SQL over the scraped data with embedded DuckDB.
+
+DuckDB reads the window files in place, nested fields and all, in parallel
+across cores and spilling to disk when a query outgrows memory, so questions
+the analysis scripts do not answer need neither Postgres nor a pandas loop.
+
+Views available to queries:
+
+    contracts        every contract once, in its latest updated_at version
+    raw_contracts    every record in every contract file, duplicates included,
+                     with the file it came from in `filename`
+    flat_contracts   the flattened Parquet cache (product_type, vehicle_make, ...),
+                     if load_contract_frame has built it
+    star_<table>     the star_export.py tables (star_contracts, star_products, ...),
+                     if they have been exported
+
+Contract files are the date windows saved by the scraper and the batches saved
+by sync_updates, so the views hold the same contracts as the local store.
+
+Nested objects are structs, so fields are reached with dots:
+
+    python query_engine.py "SELECT vehicle.make, product.term, count(*) AS contracts
+                            FROM contracts GROUP BY ALL ORDER BY contracts DESC"
+    python query_engine.py --tables
+    python query_engine.py --output by_make.parquet "SELECT ..."
+
+    engine = QueryEngine("scraped_data")
+    df = engine.query("SELECT status, count(*) FROM contracts GROUP BY status")
+"""
+import argparse
+import os
+import time
+
+import duckdb
+
+from contract_files import list_contract_files
+from contract_loader import CACHE_DIR
+from star_export import STAR_DIR
+
+TEMP_DIR = ".duckdb_tmp"
+
+def _sql_list(paths):
+    return "[" + ", ".join("'" + path.replace("'", "''") + "'" for path in paths) + "]"
+
+class QueryEngine:
+    """
+    DuckDB connection with views over one scrape directory
+
+    `threads` defaults to one per core. `memory_limit` (e.g. "4GB") caps
+    DuckDB's memory; larger sorts, joins and aggregations spill to a
+    temporary directory inside the scrape directory.
+    """
+    def __init__(self, directory="scraped_data", threads=None, memory_limit=None):
+        self.directory = directory
+        self.connection = duckdb.connect()
+        self.connection.execute(f"SET temp_directory = '{os.path.join(directory, TEMP_DIR)}'")
+        if threads:
+            self.connection.execute(f"SET threads = {int(threads)}")
+        if memory_limit:
+            self.connection.execute(f"SET memory_limit = '{memory_limit}'")
+        self.views = []
+        self._create_views()
+
+    def _view(self, name, select):
+        self.connection.execute(f"CREATE OR REPLACE VIEW {name} AS {select}")
+        self.views.append(name)
+
+    def _create_views(self):
+        paths = list_contract_files(self.directory)
+        ndjson = [path for path in paths if not path.endswith(".json")]
+        arrays = [path for path in paths if path.endswith(".json")]
+
+        # union_by_name lines up columns across windows whose fields differ
+        selects = []
+        if ndjson:
+            selects.append(f"SELECT * FROM read_json({_sql_list(ndjson)}, "
+                           "format = 'newline_delimited', union_by_name = true, filename = true)")
+        if arrays:
+            selects.append(f"SELECT * FROM read_json({_sql_list(arrays)}, "
+                           "format = 'array', union_by_name = true, filename = true)")
+        if selects:
+            self._view("raw_contracts", " UNION ALL BY NAME ".join(selects))
+            # Same rule as the store: the latest updated_at version of each id,
+            # ties going to the later file (sync batches sort after windows)
+            self._view("contracts", """
+                SELECT * EXCLUDE (filename) FROM raw_contracts
+                QUALIFY row_number() OVER (
+                    PARTITION BY id ORDER BY updated_at DESC NULLS LAST, filename DESC
+                ) = 1
+            """)
+
+        cache_dir = os.path.join(self.directory, CACHE_DIR)
+        if os.path.isdir(cache_dir) and any(name.endswith(".parquet") for name in os.listdir(cache_dir)):
+            pattern = os.path.join(cache_dir, "*.parquet").replace("'", "''")
+            self._view("flat_contracts", f"SELECT * FROM read_parquet('{pattern}', union_by_name = true)")
+
+        star_dir = os.path.join(self.directory, STAR_DIR)
+        if os.path.isdir(star_dir):
+            for file_name in sorted(os.listdir(star_dir)):
+                if file_name.endswith(".parquet"):
+                    path = os.path.join(star_dir, file_name).replace("'", "''")
+                    self._view(f"star_{file_name[:-len('.parquet')]}", f"SELECT * FROM read_parquet('{path}')")
+
+    def relation(self, sql):
+        """Run sql and return the DuckDB relation, for Arrow output or further SQL"""
+        return self.connection.sql(sql)
+
+    def query(self, sql):
+        """Run sql and return the result as a pandas DataFrame"""
+        return self.connection.sql(sql).df()
+
+    def describe(self, view):
+        """Column names and types of a view"""
+        return self.query(f"DESCRIBE {view}")[["column_name", "column_type"]]
+
+    def export(self, sql, path):
+        """Write the result of sql to a .parquet, .csv or .json file without loading it into Python"""
+        formats = {".parquet": "PARQUET", ".csv": "CSV", ".json": "JSON"}
+        extension = os.path.splitext(path)[1]
+        if extension not in formats:
+            raise ValueError(f"Unknown output format {extension!r}; expected one of {', '.join(formats)}")
+        target = path.replace("'", "''")
+        self.connection.execute(f"COPY ({sql}) TO '{target}' (FORMAT {formats[extension]})")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def query(sql, directory="scraped_data", **kwargs):
+    """Run one query against directory and return a DataFrame"""
+    with QueryEngine(directory, **kwargs) as engine:
+        return engine.query(sql)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SQL over the scraped contract data")
+    parser.add_argument("sql", nargs="?", help="query to run; see --tables for what is available")
+    parser.add_argument("--directory", default="scraped_data")
+    parser.add_argument("--threads", type=int, default=None, help="default: one per core")
+    parser.add_argument("--memory-limit", help='e.g. "4GB"; larger queries spill to disk')
+    parser.add_argument("--output", help="write the result to a .parquet, .csv or .json file")
+    parser.add_argument("--tables", action="store_true", help="list the views and their columns")
+    args = parser.parse_args()
+
+    if not args.sql and not args.tables:
+        parser.error("give a query or --tables")
+
+    with QueryEngine(args.directory, args.threads, args.memory_limit) as engine:
+        if args.tables:
+            for view in engine.views:
+                print(f"\n{view}")
+                print("-" * 80)
+                for name, column_type in engine.describe(view).itertuples(index=False):
+                    print(f"{name:<32}{column_type}")
+            return
+
+        start = time.perf_counter()
+        if args.output:
+            engine.export(args.sql, args.output)
+            print(f"Wrote {args.output} in {time.perf_counter() - start:.2f}s")
+        else:
+            df = engine.query(args.sql)
+            print(df.to_string(index=False))
+            print(f"\n{len(df)} rows in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
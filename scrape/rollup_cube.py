@@ -0,0 +1,314 @@
+"""Rollup cube of contract volume and money, kept next to the contract store.
+
+Two tables in scraped_data/contracts.sqlite hold one row per
+day x contract_type x make x dealership (id and name; id 0 when the contract
+has none):
+
+    sales_rollup    contracts sold that day (by created_at): count and
+                    contract price, tax, total and dealer cost in cents
+    claims_rollup   claims opened that day (by the claim's created_at):
+                    count, closed count and amount in cents
+
+The scraper calls refresh() with the ids of each saved window or sync batch
+after merging it into the store, so the cube follows the data as it arrives.
+refresh() folds in only contracts whose stored content changed since the last
+refresh. Each contract's previous contribution is kept in rollup_members and
+subtracted first, so an updated contract (status, claims) moves between cells
+instead of being counted twice. A refresh reads and writes in one immediate
+transaction, so processes sharing the store never fold the same change twice. Monthly figures are sums over the day cells,
+so reports such as SalesReport.monthly_totals and ClaimsReport.monthly_totals
+(src/schemas/reports.py) are answered from a few thousand rows in
+milliseconds.
+
+    python rollup_cube.py                              # sales by month
+    python rollup_cube.py --cube claims --by make
+    python rollup_cube.py --by contract_type --start 2019-01-01 --end 2019-06-30
+
+    with ContractStore("scraped_data/contracts.sqlite") as store:
+        cube = RollupCube(store)
+        cube.refresh()
+        cube.monthly_totals("sales", "contract_price_cents", start="2019-01-01")
+"""
+import argparse
+import json
+import os
+import time
+
+from contract_loader import default_workers
+from contract_store import ContractStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales_rollup (
+    day TEXT NOT NULL,
+    contract_type TEXT NOT NULL,
+    make TEXT NOT NULL,
+    dealership_id INTEGER NOT NULL,
+    dealership TEXT NOT NULL,
+    contracts INTEGER NOT NULL,
+    contract_price_cents INTEGER NOT NULL,
+    tax_cents INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL,
+    dealer_cost_cents INTEGER NOT NULL,
+    PRIMARY KEY (day, contract_type, make, dealership_id, dealership)
+);
+CREATE TABLE IF NOT EXISTS claims_rollup (
+    day TEXT NOT NULL,
+    contract_type TEXT NOT NULL,
+    make TEXT NOT NULL,
+    dealership_id INTEGER NOT NULL,
+    dealership TEXT NOT NULL,
+    claims INTEGER NOT NULL,
+    closed_claims INTEGER NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    PRIMARY KEY (day, contract_type, make, dealership_id, dealership)
+);
+CREATE TABLE IF NOT EXISTS rollup_members (
+    contract_id INTEGER PRIMARY KEY,
+    content_hash TEXT,
+    contributions TEXT NOT NULL
+);
+"""
+
+# Dropped to rebuild a cube from before cells were keyed by dealership_id
+CUBE_TABLES = ("sales_rollup", "claims_rollup", "rollup_members")
+
+KEYS = ("day", "contract_type", "make", "dealership_id", "dealership")
+MEASURES = {
+    "sales": ("contracts", "contract_price_cents", "tax_cents", "total_cents", "dealer_cost_cents"),
+    "claims": ("claims", "closed_claims", "amount_cents"),
+}
+# ReportFilters field -> cube column
+FILTERS = {
+    "contract_types": "contract_type",
+    "vehicle_makes": "make",
+    "dealership_ids": "dealership_id",
+    "dealerships": "dealership",
+}
+CLAIM_PRICES = ("labour_price", "parts_price", "tax_price", "other_price")
+
+def _cents(dollars):
+    return round(float(dollars) * 100) if dollars is not None else 0
+
+def contributions(contract):
+    """
+    The cube cells one contract adds to, as {cube: [[day, type, make,
+    dealership_id, dealership, *measures], ...]}
+    """
+    vehicle = contract.get("vehicle") or {}
+    product = contract.get("product") or {}
+    keys = [
+        contract.get("contract_type") or "Unknown",
+        vehicle.get("make") or "Unknown",
+        contract.get("dealership_id") or 0,
+        contract.get("dealership") or "Unknown",
+    ]
+
+    cells = {"sales": [], "claims": []}
+    created_at = contract.get("created_at")
+    if created_at:
+        cells["sales"].append([
+            created_at[:10], *keys, 1,
+            _cents(contract.get("contract_price")), _cents(contract.get("tax")),
+            _cents(contract.get("total")), product.get("dealer_cost") or 0,
+        ])
+    for claim in contract.get("claims") or []:
+        claim_created = claim.get("created_at") or claim.get("opened_at")
+        if not claim_created:
+            continue
+        cells["claims"].append([
+            claim_created[:10], *keys, 1,
+            1 if claim.get("status") == "closed" else 0,
+            sum(claim.get(field) or 0 for field in CLAIM_PRICES),
+        ])
+    return cells
+
+class RollupCube:
+    def __init__(self, store):
+        self.store = store
+        self.conn = store.conn
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+
+    def _migrate(self):
+        # Cubes built before cells were keyed by dealership_id are rebuilt from
+        # the store; dropping rollup_members makes the next refresh fold everything
+        key = {row[1] for row in self.conn.execute("PRAGMA table_info(sales_rollup)") if row[5]}
+        if key and "dealership_id" not in key:
+            with self.conn:
+                for table in CUBE_TABLES:
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+    def _changed_ids(self, ids=None, batch_size=500):
+        query = """
+            SELECT c.id FROM contracts c
+            LEFT JOIN rollup_members m ON m.contract_id = c.id
+            WHERE (m.contract_id IS NULL OR m.content_hash IS NOT c.content_hash)
+        """
+        if ids is None:
+            return [row[0] for row in self.conn.execute(query)]
+
+        # Only the given ids, looked up by primary key instead of scanning the store
+        ids = list(dict.fromkeys(ids))
+        changed = []
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            changed.extend(row[0] for row in self.conn.execute(
+                f"{query} AND c.id IN ({','.join('?' * len(batch))})", batch
+            ))
+        return changed
+
+    def refresh(self, ids=None, batch_size=5000):
+        """
+        Fold in new and changed contracts from the store; returns how many
+
+        `ids` limits the check to those contracts, e.g. the ones just imported,
+        so a refresh after each window does not scan the whole store.
+        """
+        # BEGIN IMMEDIATE takes the write lock before reading, so a concurrent
+        # refresh waits and then sees these contracts as already folded
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = self._changed_ids(ids)
+            for start in range(0, len(changed), batch_size):
+                self._fold(changed[start:start + batch_size])
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return len(changed)
+
+    def _fold(self, ids):
+        placeholders = ",".join("?" * len(ids))
+        rows = self.conn.execute(
+            f"""
+            SELECT c.id, c.content_hash, c.body, m.contributions FROM contracts c
+            LEFT JOIN rollup_members m ON m.contract_id = c.id
+            WHERE c.id IN ({placeholders})
+            """,
+            ids,
+        ).fetchall()
+
+        # Net change per cell for the whole batch, so each cell is written once
+        deltas = {cube: {} for cube in MEASURES}
+        members = []
+        for contract_id, content_hash, body, previous in rows:
+            if previous:
+                self._add(deltas, json.loads(previous), -1)
+            cells = contributions(json.loads(body))
+            self._add(deltas, cells, 1)
+            members.append((contract_id, content_hash, json.dumps(cells, separators=(",", ":"))))
+
+        for cube, cube_deltas in deltas.items():
+            self._apply(cube, cube_deltas)
+        self.conn.executemany(
+            "INSERT INTO rollup_members (contract_id, content_hash, contributions) VALUES (?, ?, ?) "
+            "ON CONFLICT (contract_id) DO UPDATE SET content_hash = excluded.content_hash, "
+            "contributions = excluded.contributions",
+            members,
+        )
+
+    @staticmethod
+    def _add(deltas, cells, sign):
+        for cube, cube_cells in cells.items():
+            for cell in cube_cells:
+                key = tuple(cell[:len(KEYS)])
+                measures = [sign * value for value in cell[len(KEYS):]]
+                current = deltas[cube].get(key)
+                if current is None:
+                    deltas[cube][key] = measures
+                else:
+                    deltas[cube][key] = [a + b for a, b in zip(current, measures)]
+
+    def _apply(self, cube, deltas):
+        if not deltas:
+            return
+        measures = MEASURES[cube]
+        columns = ", ".join(KEYS + measures)
+        updates = ", ".join(f"{m} = {cube}_rollup.{m} + excluded.{m}" for m in measures)
+        self.conn.executemany(
+            f"INSERT INTO {cube}_rollup ({columns}) VALUES ({','.join('?' * (len(KEYS) + len(measures)))}) "
+            f"ON CONFLICT ({', '.join(KEYS)}) DO UPDATE SET {updates}",
+            [(*key, *values) for key, values in deltas.items()],
+        )
+        # Cells whose last contract moved away
+        self.conn.execute(f"DELETE FROM {cube}_rollup WHERE {measures[0]} = 0")
+
+    def _where(self, start, end, filters):
+        clauses, params = [], []
+        if start:
+            clauses.append("day >= ?")
+            params.append(str(start)[:10])
+        if end:
+            clauses.append("day <= ?")
+            params.append(str(end)[:10])
+        for name, values in filters.items():
+            if values is None:
+                continue
+            if name not in FILTERS:
+                raise ValueError(f"Unknown filter {name!r}; expected one of {', '.join(FILTERS)}")
+            clauses.append(f"{FILTERS[name]} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def totals(self, cube, by, measure=None, start=None, end=None, **filters):
+        """
+        {group: sum of measure} for one cube, grouped by "day", "month", "year"
+        or a key column; measure defaults to the cube's count
+
+        Filters take ReportFilters names (contract_types, vehicle_makes,
+        dealership_ids) or dealerships, and start/end are inclusive days.
+        """
+        if cube not in MEASURES:
+            raise ValueError(f"Unknown cube {cube!r}; expected one of {', '.join(MEASURES)}")
+        measure = measure or MEASURES[cube][0]
+        if measure not in MEASURES[cube]:
+            raise ValueError(f"Unknown measure {measure!r}; expected one of {', '.join(MEASURES[cube])}")
+        groups = {"day": "day", "month": "substr(day, 1, 7)", "year": "substr(day, 1, 4)"}
+        group = groups.get(by, by if by in KEYS else None)
+        if group is None:
+            raise ValueError(f"Unknown grouping {by!r}")
+
+        where, params = self._where(start, end, filters)
+        rows = self.conn.execute(
+            f"SELECT {group} AS grp, SUM({measure}) FROM {cube}_rollup{where} GROUP BY grp ORDER BY grp",
+            params,
+        )
+        return {group_value: total for group_value, total in rows}
+
+    def monthly_totals(self, cube="sales", measure="contract_price_cents", start=None, end=None, **filters):
+        """{"YYYY-MM": cents}, the monthly_totals of SalesReport / ClaimsReport"""
+        return self.totals(cube, "month", measure, start, end, **filters)
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and query the contract rollup cube")
+    parser.add_argument("--directory", default="scraped_data")
+    parser.add_argument("--cube", choices=sorted(MEASURES), default="sales")
+    parser.add_argument("--by", default="month", help="day, month, year, contract_type, make, dealership_id or dealership")
+    parser.add_argument("--measure", help="default: every measure of the cube")
+    parser.add_argument("--start", help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", help="last day, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    with ContractStore(os.path.join(args.directory, "contracts.sqlite")) as store:
+        store.import_directory(args.directory, default_workers())
+        cube = RollupCube(store)
+
+        started = time.perf_counter()
+        changed = cube.refresh()
+        print(f"Folded {changed} new or changed contracts into the cube in "
+              f"{time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        measures = [args.measure] if args.measure else MEASURES[args.cube]
+        results = {m: cube.totals(args.cube, args.by, m, args.start, args.end) for m in measures}
+        elapsed = time.perf_counter() - started
+
+    print(f"\n{args.cube.title()} by {args.by}")
+    print("-" * 80)
+    print(f"{args.by:<20}" + "".join(f"{m:>22}" for m in measures))
+    for group in results[measures[0]]:
+        print(f"{group!s:<20}" + "".join(f"{results[m][group]:>22,}" for m in measures))
+    print(f"\nQueried in {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
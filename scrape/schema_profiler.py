@@ -0,0 +1,179 @@
+"""Profile the schema of every scraped contract, nested fields included.
+
+Each window file is profiled in a process pool and the per-file profiles are
+merged. For every field path (product.dealer_cost, claims[].amount, ...) the
+report gives how often it is present, its null rate, the mix of value types,
+an approximate distinct count (HyperLogLog) and a few sample values.
+
+Window files are profiled as written, so every scraped version of a contract
+counts; that is what shows fields and types that changed over the history.
+
+    python schema_profiler.py --directory scraped_data --workers 4
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from contract_files import iter_records, list_contract_files
+from contract_loader import default_workers
+from sketches import HyperLogLog, hash_values
+
+MAX_SAMPLES = 3
+
+class FieldProfile:
+    def __init__(self):
+        self.present = 0
+        self.nulls = 0
+        self.types = Counter()
+        self.distinct = HyperLogLog(precision=10)
+        self.samples = []
+
+    def merge(self, other):
+        self.present += other.present
+        self.nulls += other.nulls
+        self.types.update(other.types)
+        self.distinct.merge(other.distinct)
+        for sample in other.samples:
+            if len(self.samples) < MAX_SAMPLES and sample not in self.samples:
+                self.samples.append(sample)
+
+# (prefix, key) -> field path, so path strings are built once per process
+_PATHS = {}
+
+class SchemaProfile:
+    """Mergeable per-path statistics over any number of contracts"""
+    def __init__(self):
+        self.records = 0
+        self.fields = {}
+
+    def _add_value(self, value, path, values):
+        field = self.fields.get(path)
+        if field is None:
+            field = self.fields[path] = FieldProfile()
+        field.present += 1
+        if value is None:
+            field.nulls += 1
+            return
+        kind = type(value)
+        field.types[kind.__name__] += 1
+
+        if kind is dict:
+            self._add_dict(value, path + ".", values)
+        elif kind is list:
+            item_path = path + "[]"
+            for item in value:
+                self._add_value(item, item_path, values)
+        else:
+            values[path].append(value)
+            if len(field.samples) < MAX_SAMPLES:
+                sample = str(value)
+                if sample not in field.samples:
+                    field.samples.append(sample)
+
+    def _add_dict(self, record, prefix, values):
+        for key, value in record.items():
+            path = _PATHS.get((prefix, key))
+            if path is None:
+                path = _PATHS[(prefix, key)] = prefix + key
+            self._add_value(value, path, values)
+
+    def add_records(self, records):
+        """Profile a batch of contracts"""
+        values = defaultdict(list)
+        for record in records:
+            self.records += 1
+            self._add_dict(record, "", values)
+
+        # Hash every scalar in the batch at once, then feed each path's slice
+        # to its sketch; one hashing call per path would dominate the run time
+        paths = list(values)
+        if not paths:
+            return
+        hashes = hash_values([value for path in paths for value in values[path]])
+        offset = 0
+        for path in paths:
+            end = offset + len(values[path])
+            self.fields[path].distinct.update_hashes(hashes[offset:end])
+            offset = end
+
+    def merge(self, other):
+        self.records += other.records
+        for path, other_field in other.fields.items():
+            field = self.fields.get(path)
+            if field is None:
+                self.fields[path] = other_field
+            else:
+                field.merge(other_field)
+
+    def report(self):
+        print("\nField Analysis:")
+        print("-" * 80)
+        # Every scraped version counts, so this exceeds the distinct contracts
+        print(f"Total number of records analyzed: {self.records}")
+        print("-" * 80)
+
+        for path, field in self.fields.items():
+            print(f"\nField: {path}")
+            if "[]" in path:
+                # List items have no fixed count per contract
+                print(f"Occurrence: {field.present} list items")
+            else:
+                print(f"Occurrence: {field.present} times ({field.present / self.records:.1%})")
+            print(f"Null rate: {field.nulls / field.present:.1%}")
+            non_null = field.present - field.nulls
+            if non_null:
+                types = ", ".join(f"{name} {count / non_null:.1%}" for name, count in field.types.most_common())
+                print(f"Data types: {types}")
+            if field.samples:
+                print(f"Distinct values (approx): {len(field.distinct)}")
+                print(f"Sample values: {', '.join(field.samples)}")
+
+def _profile_file(path):
+    """Process-pool task: profile one window file"""
+    profile = SchemaProfile()
+    try:
+        profile.add_records(iter_records(path))
+        return path, profile, None
+    except (json.JSONDecodeError, EOFError, OSError) as e:
+        return path, None, str(e)
+
+def profile_directory(directory, workers=None):
+    """Profile every window file in directory, in parallel, and return the merged profile"""
+    workers = workers or default_workers()
+    paths = list_contract_files(directory)
+    profile = SchemaProfile()
+
+    def merge(results):
+        # Folded in as they arrive instead of collecting every file profile first
+        for path, file_profile, error in results:
+            if error is not None:
+                print(f"Error reading {os.path.basename(path)}")
+                continue
+            profile.merge(file_profile)
+
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            merge(pool.map(_profile_file, paths, chunksize=4))
+    else:
+        merge(_profile_file(path) for path in paths)
+    return profile
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile field paths across all scraped contracts")
+    parser.add_argument("--directory", default="scraped_data")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per core")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    profile = profile_directory(args.directory, args.workers)
+    elapsed = time.perf_counter() - start
+
+    profile.report()
+    print(f"\nProfiled {profile.records} records in {elapsed:.1f}s "
+          f"({profile.records / max(elapsed, 1e-9):,.0f} records/s)")
+
+if __name__ == "__main__":
+    main()
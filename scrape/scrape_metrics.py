@@ -0,0 +1,108 @@
+"""Per-window throughput metrics for CanadaGeneralScraper.
+
+Every fetched window appends one JSON line to scraped_data/metrics.jsonl with
+its request latency, response bytes, records parsed, parse time, write time and
+retries. At the end of a run a summary line (records/s, p50/p95 latency, ...)
+is appended and printed, so slow runs can be traced to latency, payload size
+or parsing, and concurrency and window size can be tuned from the log.
+"""
+import json
+import math
+import time
+from datetime import datetime
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (0 < pct <= 100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+class ScrapeMetrics:
+    def __init__(self, path):
+        self.path = path
+        self.begin_run("scrape")
+
+    def begin_run(self, mode):
+        """Start a new run; the summary only covers windows recorded since"""
+        self.mode = mode
+        self.entries = []
+        self.started = time.perf_counter()
+
+    def _append(self, entry):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def record_window(self, window, state, latency=None, num_bytes=0, num_records=0,
+                      parse_time=None, write_time=None, retries=0, error=None):
+        """
+        Log one window
+
+        state is "done", "failed", or "discarded" for an adaptive window that
+        was over the thresholds and re-fetched in halves.
+        """
+        def rounded(value):
+            return round(value, 6) if value is not None else None
+
+        entry = {
+            "event": "window",
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "mode": self.mode,
+            "window": window,
+            "state": state,
+            "latency": rounded(latency),
+            "bytes": num_bytes,
+            "records": num_records,
+            "parse_time": rounded(parse_time),
+            "write_time": rounded(write_time),
+            "retries": retries,
+            "error": error,
+        }
+        self.entries.append(entry)
+        self._append(entry)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        done = [e for e in self.entries if e["state"] == "done"]
+        latencies = [e["latency"] for e in self.entries if e["latency"] is not None]
+        records = sum(e["records"] for e in done)
+        num_bytes = sum(e["bytes"] for e in self.entries)
+
+        def rounded(value):
+            return round(value, 4) if value is not None else None
+
+        return {
+            "event": "summary",
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "mode": self.mode,
+            "elapsed": round(elapsed, 3),
+            "windows": len(done),
+            "failed_windows": sum(1 for e in self.entries if e["state"] == "failed"),
+            "discarded_windows": sum(1 for e in self.entries if e["state"] == "discarded"),
+            "requests": len(self.entries) + sum(e["retries"] for e in self.entries),
+            "retries": sum(e["retries"] for e in self.entries),
+            "records": records,
+            "bytes": num_bytes,
+            "records_per_sec": round(records / elapsed, 1) if elapsed else None,
+            "bytes_per_sec": round(num_bytes / elapsed, 1) if elapsed else None,
+            "latency_p50": rounded(percentile(latencies, 50)),
+            "latency_p95": rounded(percentile(latencies, 95)),
+            "latency_max": rounded(max(latencies, default=None)),
+            "parse_time_total": rounded(sum(e["parse_time"] or 0 for e in self.entries)),
+            "write_time_total": rounded(sum(e["write_time"] or 0 for e in done)),
+        }
+
+    def end_run(self):
+        """Append and print the run summary, and return it"""
+        summary = self.summary()
+        self._append(summary)
+
+        latency = ("n/a" if summary["latency_p50"] is None else
+                   f"p50 {summary['latency_p50']:.3f}s / p95 {summary['latency_p95']:.3f}s")
+        print(f"[{self.mode}] {summary['windows']} windows ({summary['failed_windows']} failed, "
+              f"{summary['retries']} retries), {summary['records']} records in "
+              f"{summary['elapsed']:.1f}s: {summary['records_per_sec']} records/s, "
+              f"latency {latency}, parse {summary['parse_time_total']:.2f}s, "
+              f"write {summary['write_time_total']:.2f}s")
+        return summary
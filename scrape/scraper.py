@@ -1,20 +1,213 @@
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import asyncio
+from collections import namedtuple
 import json
+import multiprocessing
 import os
+import random
+import sqlite3
+import threading
 import time
 
+import aiohttp
+
+from contract_files import FORMATS, updates_filename, window_filename, write_records
+from contract_store import ContractStore
+from rollup_cube import RollupCube
+from scrape_metrics import ScrapeMetrics
+
+# One successful request: the parsed body plus what it cost to get it
+FetchResult = namedtuple("FetchResult", ["data", "num_bytes", "attempts", "latency", "parse_time"])
+
+def _parse_timestamp(value):
+    """Parse an ISO timestamp as returned by the API, with or without a trailing Z"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def _record_ids(records):
+    return [record["id"] for record in records if record.get("id") is not None]
+
+def iter_windows(start_date, end_date, interval_days=1):
+    """Yield (from_date, to_date) strings covering the range"""
+    current_date = datetime.strptime(start_date, "%Y-%m-%d")
+    end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
+
+    while current_date <= end_datetime:
+        interval_end = min(current_date + timedelta(days=interval_days), end_datetime)
+        yield current_date.strftime("%Y-%m-%d"), interval_end.strftime("%Y-%m-%d")
+
+        # Move to next interval
+        current_date = interval_end + timedelta(days=1)
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by every request a scraper makes.
+
+    `rate` is the sustained number of requests per second and `capacity` the
+    number of requests that may be issued back-to-back after an idle period.
+    """
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token and return how long the caller must wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def wait(self):
+        """Block until a request may be issued"""
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire(self):
+        """Wait, without blocking the event loop, until a request may be issued"""
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket whose state lives in shared memory, so worker processes draw
+    from one global budget. Create it in the parent and pass it to each worker.
+    """
+    def __init__(self, rate, capacity=1, context=multiprocessing):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        # [tokens, last update], guarded by the array's own process-shared lock
+        self._state = context.Array('d', [float(self.capacity), time.monotonic()])
+
+    def _reserve(self):
+        with self._state.get_lock():
+            tokens, updated = self._state[0], self._state[1]
+            now = time.monotonic()
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate) - 1
+            self._state[0], self._state[1] = tokens, now
+            if tokens >= 0:
+                return 0
+            return -tokens / self.rate
+
+class ScrapeError(Exception):
+    """Raised when a request still fails after all retries"""
+    def __init__(self, message, attempts):
+        super().__init__(message)
+        self.attempts = attempts
+
+class ScrapeManifest:
+    """Persistent per-window scrape state, stored as JSON next to the scraped files.
+
+    Each window is keyed by "<from>_to_<to>" and records its state ("done" or
+    "failed"), the response size in bytes, the number of records, how many
+    attempts were made and the last error. The file is rewritten atomically
+    after every update so a crash never leaves it half-written.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.windows = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.windows = json.load(f).get("windows", {})
+
+    @staticmethod
+    def key(from_date, to_date):
+        return f"{from_date}_to_{to_date}"
+
+    def get(self, from_date, to_date):
+        return self.windows.get(self.key(from_date, to_date))
+
+    def is_done(self, from_date, to_date):
+        entry = self.get(from_date, to_date)
+        return entry is not None and entry["state"] == "done"
+
+    def _update(self, from_date, to_date, **fields):
+        entry = self.windows.setdefault(self.key(from_date, to_date), {
+            "from": from_date,
+            "to": to_date,
+            "attempts": 0,
+        })
+        entry.update(fields)
+        entry["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        self.save()
+
+    def mark_done(self, from_date, to_date, num_bytes, num_records, attempts):
+        self._update(from_date, to_date, state="done", bytes=num_bytes,
+                     records=num_records, attempts=attempts, error=None)
+
+    def mark_failed(self, from_date, to_date, error, attempts):
+        self._update(from_date, to_date, state="failed", attempts=attempts, error=error)
+
+    def done_window_from(self, from_date):
+        """Return the completed window starting on from_date, if any"""
+        for entry in self.windows.values():
+            if entry["from"] == from_date and entry["state"] == "done":
+                return entry
+        return None
+
+    def failed_windows(self):
+        return [entry for entry in self.windows.values() if entry["state"] == "failed"]
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"windows": self.windows}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
 class CanadaGeneralScraper:
-    def __init__(self):
-        self.base_url = "https://canadageneral.ca"
+    def __init__(self, requests_per_second=0.5, burst=1, max_retries=4,
+                 backoff_base=2.0, backoff_max=120.0, output_format="ndjson.gz",
+                 rate_limiter=None, base_url="https://canadageneral.ca",
+                 output_dir="scraped_data"):
+        self.base_url = base_url
         self.login_url = f"{self.base_url}/login"
         self.search_url = f"{self.base_url}/search/contracts"
         self.session = requests.Session()
+
+        # Politeness budget shared by the serial and concurrent fetch modes.
+        # The default of one request every two seconds matches the old fixed delay.
+        # Pass a SharedTokenBucket to share one budget between processes.
+        self.rate_limiter = rate_limiter or TokenBucket(requests_per_second, burst)
+        
+        # Failed windows are retried with exponential backoff and full jitter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
         
+        # Windows are written as compressed NDJSON by default, see contract_files
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}")
+        self.output_format = output_format
+
         # Create directory for storing JSON files if it doesn't exist
-        self.output_dir = "scraped_data"
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
+        self.output_dir = output_dir
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        # Completed windows are skipped on rerun, failed ones are tried again
+        self.manifest = ScrapeManifest(os.path.join(self.output_dir, "manifest.json"))
+
+        # Latest version of every contract, kept current as windows are saved
+        # and by sync_updates, along with the report rollups (rollup_cube)
+        self.store_path = os.path.join(self.output_dir, "contracts.sqlite")
+
+        # Called with each list of contracts as it is saved, e.g. PostgresLoader.add
+        self.record_callbacks = []
+
+        # Per-window latency, size, parse/write time and retries, see scrape_metrics
+        self.metrics = ScrapeMetrics(os.path.join(self.output_dir, "metrics.jsonl"))
 
     def login(self, username, password):
         """Handle login to the website"""
@@ -44,51 +237,347 @@ class CanadaGeneralScraper:
             print(f"Login error: {str(e)}")
             return False
 
-    def scrape_data(self, start_date, end_date, interval_days=1):
+    def _window_path(self, from_date, to_date):
+        return os.path.join(self.output_dir,
+                            window_filename(from_date, to_date, self.output_format))
+
+    def _save_window(self, from_date, to_date, data):
+        """Write one window's response to the output directory and return its record count"""
+        records = data if isinstance(data, list) else [data]
+        num_records = write_records(self._window_path(from_date, to_date), records)
+        for callback in self.record_callbacks:
+            callback(records)
+
+        print(f"Successfully saved data for period {from_date} to {to_date}")
+        return num_records
+
+    def _merge_into_store(self, path, records):
+        """Merge a saved window into the store and fold its records into the report rollups"""
+        try:
+            with ContractStore(self.store_path) as store:
+                store.import_file(path)
+                # Only this window's contracts, so the cost does not grow with the store
+                RollupCube(store).refresh(_record_ids(records))
+        except sqlite3.Error as e:
+            # The window file is saved; the next import_directory or sync picks it up
+            print(f"Error updating {os.path.basename(self.store_path)} with "
+                  f"{os.path.basename(path)}: {str(e)}")
+
+    def _is_complete(self, from_date, to_date):
+        """A window is complete once the manifest says so and its file is still on disk"""
+        return (self.manifest.is_done(from_date, to_date)
+                and os.path.exists(self._window_path(from_date, to_date)))
+
+    def _backoff_delay(self, attempt):
+        """Exponential backoff with full jitter for the given (1-based) attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _retry_delay(self, description, error, attempt):
+        """Log a failed attempt; return the delay before the next one, or None to give up"""
+        if attempt > self.max_retries:
+            print(f"Error scraping data for {description}: {str(error)} "
+                  f"(giving up after {attempt} attempts)")
+            return None
+
+        delay = self._backoff_delay(attempt)
+        print(f"Error scraping data for {description}: {str(error)} "
+              f"(retrying in {delay:.1f}s)")
+        return delay
+
+    def _fetch(self, params, description):
+        """
+        GET the search endpoint, retrying failures with backoff
+
+        Returns a FetchResult and raises ScrapeError once retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                # Wait for the rate limiter instead of sleeping a fixed delay
+                self.rate_limiter.wait()
+
+                # Make the request
+                started = time.perf_counter()
+                response = self.session.get(self.search_url, params=params)
+                response.raise_for_status()
+                latency = time.perf_counter() - started
+                
+                # Parse JSON response
+                started = time.perf_counter()
+                data = response.json()
+                parse_time = time.perf_counter() - started
+
+                return FetchResult(data, len(response.content), attempt, latency, parse_time)
+
+            except Exception as e:
+                delay = self._retry_delay(description, e, attempt)
+                if delay is None:
+                    raise ScrapeError(str(e), attempt) from e
+                time.sleep(delay)
+
+    def _fetch_window(self, from_date, to_date):
+        """
+        Fetch one window, retrying failures with backoff
+
+        Returns a FetchResult, or None once retries are exhausted.
+        """
+        # Prepare request parameters
+        params = {
+            "from": from_date,
+            "to": to_date
+        }
+
+        try:
+            return self._fetch(params, f"period {from_date} to {to_date}")
+        except ScrapeError as e:
+            self._fail_window(from_date, to_date, e, e.attempts)
+            return None
+
+    def _fail_window(self, from_date, to_date, error, attempts):
+        self.manifest.mark_failed(from_date, to_date, str(error), attempts)
+        self.metrics.record_window(ScrapeManifest.key(from_date, to_date), "failed",
+                                   retries=attempts - 1, error=str(error))
+
+    def _complete_window(self, from_date, to_date, result):
+        """Save a fetched window and record it in the manifest and metrics"""
+        started = time.perf_counter()
+        try:
+            num_records = self._save_window(from_date, to_date, result.data)
+        except OSError as e:
+            self._fail_window(from_date, to_date, e, result.attempts)
+            print(f"Error saving data for period {from_date} to {to_date}: {str(e)}")
+            return False
+        write_time = time.perf_counter() - started
+        records = result.data if isinstance(result.data, list) else [result.data]
+        self._merge_into_store(self._window_path(from_date, to_date), records)
+
+        self.manifest.mark_done(from_date, to_date, result.num_bytes, num_records, result.attempts)
+        self.metrics.record_window(
+            ScrapeManifest.key(from_date, to_date), "done", result.latency, result.num_bytes,
+            num_records, result.parse_time, write_time, result.attempts - 1
+        )
+        return True
+
+    def _scrape_window(self, from_date, to_date):
+        """Fetch and save one window, retrying failures, and record it in the manifest"""
+        result = self._fetch_window(from_date, to_date)
+        if result is None:
+            return False
+        return self._complete_window(from_date, to_date, result)
+
+    def scrape_data(self, start_date, end_date, interval_days=1, concurrency=1):
         """
         Scrape data between start and end dates with specified interval
+
+        With concurrency > 1 the windows are fetched by the asyncio engine,
+        keeping that many requests in flight on one keep-alive connection pool.
+        Windows already completed according to the manifest are skipped.
+        Returns the run's metrics summary (see scrape_metrics).
+        """
+        if concurrency > 1:
+            return asyncio.run(
+                self.scrape_data_async(start_date, end_date, interval_days, concurrency)
+            )
+
+        self.metrics.begin_run("serial")
+        for from_date, to_date in iter_windows(start_date, end_date, interval_days):
+            if self._is_complete(from_date, to_date):
+                continue
+            self._scrape_window(from_date, to_date)
+        return self.metrics.end_run()
+
+    def scrape_data_adaptive(self, start_date, end_date, interval_days=1,
+                             max_records=5000, max_bytes=20 * 1024 * 1024,
+                             max_interval_days=62):
+        """
+        Scrape data between start and end dates, resizing the window as it goes
+
+        A window whose response exceeds `max_records` or `max_bytes` is discarded
+        and re-fetched in halves, so no saved file is larger than the thresholds
+        (down to single-day windows). After a response under a quarter of both
+        thresholds the window is doubled, up to `max_interval_days`, so sparse
+        stretches of history cost few requests. Completed windows are picked up
+        from the manifest, so a rerun resumes where the last one stopped.
         """
         current_date = datetime.strptime(start_date, "%Y-%m-%d")
         end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
+        # Number of days past the window start, as in iter_windows
+        span = interval_days
+        self.metrics.begin_run("adaptive")
 
         while current_date <= end_datetime:
-            interval_end = min(current_date + timedelta(days=interval_days), end_datetime)
-            
-            # Format dates for the request
             from_date = current_date.strftime("%Y-%m-%d")
+
+            done = self.manifest.done_window_from(from_date)
+            if done and os.path.exists(self._window_path(from_date, done["to"])):
+                current_date = datetime.strptime(done["to"], "%Y-%m-%d") + timedelta(days=1)
+                continue
+
+            interval_end = min(current_date + timedelta(days=span), end_datetime)
             to_date = interval_end.strftime("%Y-%m-%d")
-            
-            # Prepare request parameters
-            params = {
-                "from": from_date,
-                "to": to_date
-            }
 
+            result = self._fetch_window(from_date, to_date)
+            if result is None:
+                current_date = interval_end + timedelta(days=1)
+                continue
+
+            num_bytes = result.num_bytes
+            num_records = len(result.data) if isinstance(result.data, list) else 1
+            days = (interval_end - current_date).days + 1
+
+            if num_records > max_records or num_bytes > max_bytes:
+                if days > 1:
+                    self.metrics.record_window(
+                        ScrapeManifest.key(from_date, to_date), "discarded", result.latency,
+                        num_bytes, num_records, result.parse_time, retries=result.attempts - 1
+                    )
+                    span = days // 2 - 1
+                    print(f"Window {from_date} to {to_date} returned {num_records} records "
+                          f"({num_bytes} bytes); bisecting to {span + 1} days")
+                    continue
+                print(f"Window {from_date} returned {num_records} records ({num_bytes} bytes), "
+                      f"over the threshold but cannot be split below one day")
+
+            self._complete_window(from_date, to_date, result)
+            current_date = interval_end + timedelta(days=1)
+
+            if num_records * 4 < max_records and num_bytes * 4 < max_bytes:
+                span = min(days * 2, max_interval_days) - 1
+
+        return self.metrics.end_run()
+
+    def sync_updates(self, since=None):
+        """
+        Fetch contracts changed since the last sync and merge them into the local store
+
+        The high-water mark is the newest `updated_at` seen by the previous sync,
+        kept in the store's sync_state table; pass `since` (an ISO timestamp) to
+        seed it on the first run or to re-sync from an earlier point. The lower
+        bound is inclusive, so contracts updated exactly at the mark are fetched
+        again and merged idempotently by id. The fetched contracts are saved as
+        contracts_updates_<timestamp> next to the window files, so the Parquet
+        cache and DuckDB see the same contracts as the store. Returns the number
+        of contracts that changed in the store, or None if the request failed.
+        """
+        with ContractStore(self.store_path) as store:
+            since = since or store.get_state("updated_at_high_water_mark") or store.max_updated_at()
+            if not since:
+                raise ValueError("No high-water mark yet; pass since= for the first sync")
+
+            # Ask the search endpoint for records changed since the mark
+            # instead of records created within a date window
+            params = {"updated_since": since}
+
+            self.metrics.begin_run("sync")
             try:
-                # Make the request
-                response = self.session.get(self.search_url, params=params)
-                response.raise_for_status()
-                
-                # Parse JSON response
-                data = response.json()
-                
-                # Save the data
-                filename = f"contracts_{from_date}_to_{to_date}.json"
-                filepath = os.path.join(self.output_dir, filename)
-                
-                with open(filepath, 'w') as f:
-                    json.dump(data, f, indent=4)
-                
-                print(f"Successfully saved data for period {from_date} to {to_date}")
-                
-                # Add a small delay between requests to be polite
-                time.sleep(2)
+                result = self._fetch(params, f"updates since {since}")
+            except ScrapeError as e:
+                self.metrics.record_window(f"updated_since_{since}", "failed",
+                                           retries=e.attempts - 1, error=str(e))
+                self.metrics.end_run()
+                return None
+
+            num_bytes = result.num_bytes
+            contracts = result.data if isinstance(result.data, list) else [result.data]
+            started = time.perf_counter()
+            changed = 0
+            if contracts:
+                # Saved like a window so every reader of the contract files
+                # (Parquet cache, partial aggregates, DuckDB) sees the updates,
+                # then merged into the store from that file
+                path = os.path.join(self.output_dir,
+                                    updates_filename(datetime.now(timezone.utc), self.output_format))
+                write_records(path, contracts)
+                changed = store.import_file(path)
+            # Keep the report rollups current with what just arrived
+            RollupCube(store).refresh(_record_ids(contracts))
+            write_time = time.perf_counter() - started
+            for callback in self.record_callbacks:
+                callback(contracts)
+            self.metrics.record_window(
+                f"updated_since_{since}", "done", result.latency, num_bytes, len(contracts),
+                result.parse_time, write_time, result.attempts - 1
+            )
+            self.metrics.end_run()
+
+            timestamps = [c["updated_at"] for c in contracts if c.get("updated_at")]
+            high_water_mark = max(timestamps + [since], key=_parse_timestamp)
+            store.set_state("updated_at_high_water_mark", high_water_mark)
+
+        print(f"Synced {len(contracts)} updated contracts since {since} "
+              f"({changed} changed, {num_bytes} bytes); high-water mark is now {high_water_mark}")
+        return changed
+
+    def _async_client(self, concurrency):
+        """Create an aiohttp session that reuses the logged-in cookies"""
+        connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=dict(self.session.headers),
+            cookies=self.session.cookies.get_dict(),
+            timeout=aiohttp.ClientTimeout(total=300),
+        )
+
+    async def _scrape_window_async(self, client, from_date, to_date):
+        """Async counterpart of _scrape_window on the shared client"""
+        params = {
+            "from": from_date,
+            "to": to_date
+        }
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                await self.rate_limiter.acquire()
+
+                started = time.perf_counter()
+                async with client.get(self.search_url, params=params) as response:
+                    response.raise_for_status()
+                    body = await response.read()
+                latency = time.perf_counter() - started
+
+                started = time.perf_counter()
+                data = json.loads(body)
+                parse_time = time.perf_counter() - started
 
             except Exception as e:
-                print(f"Error scraping data for period {from_date} to {to_date}: {str(e)}")
+                delay = self._retry_delay(f"period {from_date} to {to_date}", e, attempt)
+                if delay is None:
+                    self._fail_window(from_date, to_date, e, attempt)
+                    return False
+                await asyncio.sleep(delay)
+                continue
 
-            # Move to next interval
-            current_date = interval_end + timedelta(days=1)
+            result = FetchResult(data, len(body), attempt, latency, parse_time)
+            return self._complete_window(from_date, to_date, result)
+
+    async def scrape_data_async(self, start_date, end_date, interval_days=1, concurrency=4):
+        """
+        Scrape data between start and end dates keeping `concurrency` windows in flight
+
+        Requests still go through the scraper's token bucket, so throughput is
+        bounded by whichever of the rate limit or the upstream latency binds first.
+        """
+        self.metrics.begin_run(f"concurrent x{concurrency}")
+        queue = asyncio.Queue()
+        for window in iter_windows(start_date, end_date, interval_days):
+            if not self._is_complete(*window):
+                queue.put_nowait(window)
+
+        async with self._async_client(concurrency) as client:
+            async def worker():
+                while True:
+                    try:
+                        from_date, to_date = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await self._scrape_window_async(client, from_date, to_date)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        return self.metrics.end_run()
 
 def main():
     # Initialize scraper
@@ -111,8 +600,14 @@ def main():
     print(f"Starting scrape from {end_date} back to {start_date}")
     print("Data will be saved in weekly intervals")
     
-    # Start scraping
+    # Start scraping; rerunning resumes from the manifest in scraped_data/
     scraper.scrape_data(start_date, end_date)
 
+    failed = scraper.manifest.failed_windows()
+    if failed:
+        print(f"{len(failed)} windows failed and will be retried on the next run:")
+        for entry in failed:
+            print(f"  {entry['from']} to {entry['to']}: {entry['error']}")
+
 if __name__ == "__main__":
     main()
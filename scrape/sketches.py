@@ -0,0 +1,225 @@
+"""Mergeable approximate sketches for the analysis sketch mode.
+
+HyperLogLog estimates distinct counts and KLLSketch estimates quantiles, each
+in a fixed amount of memory however many values they see. Both fold numpy
+arrays at once; single values passed to add() are buffered and folded the
+same way in batches, so per-contract callers do not pay for one array per
+value. Both merge with another sketch of the same parameters (so per-file
+partials and worker results combine), and round-trip through JSON-serializable
+state.
+
+    models = HyperLogLog()
+    models.update(df['vehicle_model'])
+    len(models)                 # about the number of distinct models (~1.6% error)
+
+    costs = KLLSketch()
+    costs.update(df['product_dealer_cost'])
+    costs.quantile(0.99)        # rank error around 1%
+"""
+import base64
+import math
+
+import numpy as np
+import pandas as pd
+
+# Values add() buffers before folding them in as one batch
+BUFFER_SIZE = 4096
+
+def _bit_length(values):
+    """Bit length of each uint64, computed exactly on 32-bit halves"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    # frexp's exponent is the bit length of an exactly representable integer
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+def hash_values(values):
+    """64-bit hashes of an array of values, stable across runs and processes"""
+    # pandas hashes a mixed object array by its text but e.g. an all-int one
+    # numerically, so values are made text first to hash the same in any batch.
+    # Its hash uses a fixed key, so persisted sketches stay comparable across runs
+    return pd.util.hash_array(np.asarray([str(value) for value in values], dtype=object))
+
+class HyperLogLog:
+    """Distinct count estimate in 2**precision one-byte registers"""
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+        self._pending = []
+
+    def update(self, values):
+        """Add an iterable or array of values; missing values are ignored"""
+        values = np.asarray(list(values), dtype=object)
+        values = values[~pd.isna(values)]
+        if not len(values):
+            return
+        self.update_hashes(hash_values(values))
+
+    def update_hashes(self, hashes):
+        """Add values already hashed by hash_values, e.g. one slice of a larger batch"""
+        if not len(hashes):
+            return
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes << np.uint64(self.precision)
+        rank = np.minimum(64 - _bit_length(rest) + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add(self, value):
+        self._pending.append(value)
+        if len(self._pending) >= BUFFER_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self.update(pending)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        other._flush()
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        self._flush()
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+    def __len__(self):
+        return int(round(self.estimate()))
+
+    def state(self):
+        self._flush()
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["precision"])
+        sketch.registers = np.frombuffer(base64.b64decode(state["registers"]), dtype=np.uint8).copy()
+        return sketch
+
+class KLLSketch:
+    """
+    KLL quantile sketch
+
+    Values go into a stack of compactors; when a level outgrows its capacity
+    it is sorted and every other item (from a random offset) moves up a level
+    with twice the weight. Capacities shrink by 2/3 per level below the top,
+    so memory stays around 3 * k items.
+    """
+    def __init__(self, k=200):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._rng = np.random.default_rng()
+        self._pending = []
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind at this level
+                kept = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = kept
+                # Adding a level shrinks the capacities below it, so start over
+                level = 0
+                continue
+            level += 1
+
+    def _add_bounds(self, count, low, high):
+        self.count += count
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def update(self, values):
+        """Add an array of numbers; missing and non-numeric values are ignored"""
+        values = pd.to_numeric(pd.Series(values), errors="coerce").dropna().to_numpy(dtype=np.float64)
+        if not len(values):
+            return
+        self._add_bounds(len(values), float(values.min()), float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def add(self, value):
+        self._pending.append(value)
+        if len(self._pending) >= BUFFER_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self.update(pending)
+
+    def merge(self, other):
+        self._flush()
+        other._flush()
+        if not other.count:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._add_bounds(other.count, other.min, other.max)
+        self._compress()
+
+    def quantile(self, q):
+        """Approximate value at rank q (0 to 1), or None if the sketch is empty"""
+        self._flush()
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(level_items), 1 << level) for level, level_items in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        index = int(np.searchsorted(cumulative, q * cumulative[-1]))
+        return float(items[order][min(index, len(items) - 1)])
+
+    def __len__(self):
+        self._flush()
+        return self.count
+
+    def state(self):
+        self._flush()
+        return {
+            "k": self.k,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "levels": [items.tolist() for items in self.levels],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["k"])
+        sketch.count = state["count"]
+        sketch.min = state["min"]
+        sketch.max = state["max"]
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in state["levels"]]
+        return sketch
@@ -1,31 +1,137 @@
-from sqlalchemy import create_engine
+import os
+import time
+from collections import deque
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.engine import URL
-
-# Database configuration
-DATABASE_URL = URL.create(
-    drivername="postgresql",
-    username="postgres",  # Will be overridden by environment variable
-    password="postgres",  # Will be overridden by environment variable
-    host="localhost",    # Will be overridden by environment variable
-    port="5432",        # Will be overridden by environment variable
-    database="warranty_db"  # Will be overridden by environment variable
-)
-
-# Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
-
-# Create SessionLocal class
+from sqlalchemy.engine import URL, make_url
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+# Database configuration: DATABASE_URL if set, otherwise the POSTGRES_* parts.
+# The driver is chosen per engine below, so any postgresql:// URL works.
+if os.environ.get("DATABASE_URL"):
+    DATABASE_URL = make_url(os.environ["DATABASE_URL"]).set(drivername="postgresql+psycopg")
+else:
+    DATABASE_URL = URL.create(
+        drivername="postgresql+psycopg",
+        username=os.environ.get("POSTGRES_USER", "postgres"),
+        password=os.environ.get("POSTGRES_PASSWORD", "postgres"),
+        host=os.environ.get("POSTGRES_HOST", "localhost"),
+        port=_env_int("POSTGRES_PORT", 5432),
+        database=os.environ.get("POSTGRES_DB", "warranty_db"),
+    )
+
+# Same database through asyncpg, for the API
+ASYNC_DATABASE_URL = DATABASE_URL.set(drivername="postgresql+asyncpg")
+
+# Connection pool per engine, i.e. per process; size it per uvicorn worker so
+# workers x (pool_size + max_overflow) stays under Postgres max_connections
+POOL_SETTINGS = {
+    "pool_size": _env_int("DB_POOL_SIZE", 5),
+    "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),     # -1 for no limit
+    "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),      # seconds to wait for a free connection
+    "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),    # seconds; -1 keeps connections forever
+    "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),  # test connections on checkout
+}
+
+class PoolMetrics:
+    """
+    Live connection counts of an engine's pool, plus how long callers waited
+    to check a connection out
+
+    Waits are recorded by whoever checks out (get_db below) and cover queueing
+    for a free slot, opening a new connection and the pre-ping. The
+    percentiles are over the most recent `window` waits.
+    """
+    def __init__(self, engine, window=1000):
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits = deque(maxlen=window)
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+
+    def record_wait(self, seconds):
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.recent_waits.append(seconds)
+
+    def record_timeout(self):
+        self.timeouts += 1
+
+    def snapshot(self):
+        pool = self.engine.pool
+        # A negative max_overflow lets the pool grow without limit, so it never runs out
+        unbounded = POOL_SETTINGS["max_overflow"] < 0
+        capacity = POOL_SETTINGS["pool_size"] + POOL_SETTINGS["max_overflow"]
+        waits = sorted(self.recent_waits)
+
+        def percentile(q):
+            return waits[min(len(waits) - 1, int(q * len(waits)))] * 1000 if waits else 0.0
+
+        return {
+            "pool_size": POOL_SETTINGS["pool_size"],
+            "max_overflow": POOL_SETTINGS["max_overflow"],
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "exhausted": not unbounded and pool.checkedout() >= capacity,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms": {
+                "mean": self.wait_total / self.waits * 1000 if self.waits else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": self.wait_max * 1000,
+            },
+        }
+
+# Create SQLAlchemy engines: sync for scripts (ingest.py), async for the API
+engine = create_engine(DATABASE_URL, **POOL_SETTINGS)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_SETTINGS)
+
+# Pool metrics of the API's engine; served by GET /metrics/pool
+pool_metrics = PoolMetrics(async_engine.sync_engine)
+
+# Create SessionLocal classes
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False so loaded rows stay readable after commit without
+# an implicit (and, under asyncio, impossible) lazy refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Create Base class
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+# Dependency to get DB session; awaiting queries frees the event loop to
+# serve other requests while this one waits on Postgres
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        # Check the connection out up front so the wait for it is measured
+        start = time.perf_counter()
+        try:
+            await db.connection()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start)
         yield db
-    finally:
-        db.close()
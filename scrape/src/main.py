@@ -1,12 +1,15 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from .database import get_db
+from .database import get_db, pool_metrics
 from .models import (
     Contract, Vehicle, Customer, 
     WarrantyProduct, GAPProduct, ProtectionProduct
 )
+from .queries import contract_page
 from . import schemas
 
 app = FastAPI(
@@ -27,11 +30,21 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/pool")
+async def pool_status():
+    """Connection pool of this worker: checked-out and idle connections, wait times."""
+    return pool_metrics.snapshot()
+
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout_handler(request: Request, error: exc.TimeoutError):
+    # Every connection stayed busy for DB_POOL_TIMEOUT seconds
+    return JSONResponse(status_code=503, content={"detail": "Database connection pool exhausted"})
+
 # Contract endpoints
 @app.post("/contracts/", response_model=schemas.Contract)
 async def create_contract(
     contract: schemas.ContractCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new contract."""
     # Implementation will go here
@@ -39,18 +52,35 @@ async def create_contract(
 
 @app.get("/contracts/", response_model=List[schemas.Contract])
 async def list_contracts(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-):
-    """List all contracts with pagination."""
-    # Implementation will go here
-    pass
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    status: Optional[str] = None,
+    contract_type: Optional[str] = None,
+    dealership_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List contracts, newest first, with cursor pagination.
+
+    The X-Next-Cursor response header holds the cursor for the next page;
+    it is absent on the last page.
+    """
+    try:
+        page, next_cursor = await contract_page(
+            db, limit, cursor,
+            status=status, contract_type=contract_type, dealership_id=dealership_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
 
 @app.get("/contracts/{contract_id}", response_model=schemas.Contract)
 async def get_contract(
     contract_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific contract by ID."""
     # Implementation will go here
@@ -60,7 +90,7 @@ async def get_contract(
 async def update_contract(
     contract_id: int,
     contract: schemas.ContractUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a contract."""
     # Implementation will go here
@@ -69,7 +99,7 @@ async def update_contract(
 @app.delete("/contracts/{contract_id}")
 async def delete_contract(
     contract_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a contract."""
     # Implementation will go here
@@ -80,7 +110,7 @@ async def delete_contract(
 async def create_claim(
     contract_id: int,
     claim: schemas.ClaimCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new claim for a contract."""
     # Implementation will go here
@@ -89,7 +119,7 @@ async def create_claim(
 @app.get("/contracts/{contract_id}/claims/", response_model=List[schemas.Claim])
 async def list_claims(
     contract_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """List all claims for a contract."""
     # Implementation will go here
@@ -98,7 +128,7 @@ async def list_claims(
 @app.get("/claims/{claim_id}", response_model=schemas.Claim)
 async def get_claim(
     claim_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific claim by ID."""
     # Implementation will go here
@@ -108,7 +138,7 @@ async def get_claim(
 async def update_claim(
     claim_id: int,
     claim: schemas.ClaimUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a claim."""
     # Implementation will go here
@@ -117,7 +147,7 @@ async def update_claim(
 # Product endpoints
 @app.get("/products/warranty/", response_model=List[schemas.WarrantyProduct])
 async def list_warranty_products(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """List all warranty products."""
     # Implementation will go here
@@ -125,7 +155,7 @@ async def list_warranty_products(
 
 @app.get("/products/gap/", response_model=List[schemas.GAPProduct])
 async def list_gap_products(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """List all GAP products."""
     # Implementation will go here
@@ -133,7 +163,7 @@ async def list_gap_products(
 
 @app.get("/products/protection/", response_model=List[schemas.ProtectionProduct])
 async def list_protection_products(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """List all protection products."""
     # Implementation will go here
@@ -143,7 +173,7 @@ async def list_protection_products(
 @app.post("/vehicles/validate/", response_model=schemas.VehicleValidation)
 async def validate_vehicle(
     vehicle: schemas.VehicleCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Validate vehicle information and eligibility."""
     # Implementation will go here
@@ -153,7 +183,7 @@ async def validate_vehicle(
 @app.post("/customers/", response_model=schemas.Customer)
 async def create_customer(
     customer: schemas.CustomerCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new customer."""
     # Implementation will go here
@@ -162,7 +192,7 @@ async def create_customer(
 @app.get("/customers/{customer_id}", response_model=schemas.Customer)
 async def get_customer(
     customer_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific customer by ID."""
     # Implementation will go here
@@ -173,7 +203,7 @@ async def get_customer(
 async def get_sales_report(
     start_date: str,
     end_date: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Generate sales report for a date range."""
     # Implementation will go here
@@ -183,7 +213,7 @@ async def get_sales_report(
 async def get_claims_report(
     start_date: str,
     end_date: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Generate claims report for a date range."""
     # Implementation will go here
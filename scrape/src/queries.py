@@ -0,0 +1,97 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
+
+from .tables import CONTRACT_VEHICLE_FIELDS, products, vehicles, contracts, customers, claims
+
+# Query parameter -> contracts column; each has a (column, created_at, id)
+# index in tables.py, so a filtered page is one index range scan
+CONTRACT_FILTERS = {
+    "status": contracts.c.status,
+    "contract_type": contracts.c.contract_type,
+    "dealership_id": contracts.c.dealership_id,
+}
+
+def encode_cursor(created_at, contract_id):
+    """Opaque cursor pointing just past (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), contract_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """(created_at, id) from encode_cursor; raises ValueError if it is not one"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, contract_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(contract_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+
+async def _rows(db, query):
+    return [dict(row) for row in (await db.execute(query)).mappings()]
+
+def _present(row):
+    return {key: value for key, value in row.items() if value is not None}
+
+async def contract_page(db, limit, cursor=None, **filters):
+    """
+    One page of contracts, newest first, as (contracts, next cursor)
+
+    Keyset pagination on (created_at, id): the page starts right after the
+    cursor's row instead of skipping OFFSET rows, so every page costs the same
+    however deep it is. The cursor is None on the last page. Nested customer,
+    vehicle, product and claims come from one query per table for the page.
+    """
+    query = select(contracts)
+    for name, value in filters.items():
+        if value is not None:
+            query = query.where(CONTRACT_FILTERS[name] == value)
+    if cursor:
+        query = query.where(tuple_(contracts.c.created_at, contracts.c.id) < decode_cursor(cursor))
+    # One row past the page tells whether there is a next page
+    query = query.order_by(contracts.c.created_at.desc(), contracts.c.id.desc()).limit(limit + 1)
+
+    rows = await _rows(db, query)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    if not rows:
+        return [], None
+
+    ids = [row["id"] for row in rows]
+    skus = {row["product_sku"] for row in rows}
+    vins = {row["vehicle_vin"] for row in rows}
+    product_rows = {
+        row["sku"]: _present(row)
+        for row in await _rows(db, select(products).where(products.c.sku.in_(skus)))
+    }
+    vehicle_rows = {
+        row["vin"]: row
+        for row in await _rows(db, select(vehicles).where(vehicles.c.vin.in_(vins)))
+    }
+    customer_rows = {
+        row["contract_id"]: row
+        for row in await _rows(db, select(customers).where(customers.c.contract_id.in_(ids)))
+    }
+    claim_rows = {}
+    for claim in await _rows(
+        db, select(claims).where(claims.c.contract_id.in_(ids)).order_by(claims.c.contract_id, claims.c.id)
+    ):
+        claim["notes"] = claim["notes"] or []
+        claim_rows.setdefault(claim["contract_id"], []).append(claim)
+
+    page = []
+    for row in rows:
+        vehicle = dict(vehicle_rows[row.pop("vehicle_vin")])
+        vehicle["price"] = row.pop("vehicle_price")
+        for field in CONTRACT_VEHICLE_FIELDS:
+            vehicle[field] = row.pop(field)
+        row["vehicle"] = vehicle
+        row["product"] = product_rows[row.pop("product_sku")]
+        row["customer"] = customer_rows.get(row["id"])
+        row["claims"] = claim_rows.get(row["id"], [])
+        row["alert_notes"] = row["alert_notes"] or []
+        page.append(row)
+    return page, next_cursor
@@ -0,0 +1,154 @@
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, ForeignKey, Index, Integer,
+    Numeric, String, Table, Text
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .database import Base
+
+# Tables backing the pydantic models in .models, laid out as a star schema:
+# products, vehicles and dealerships are dimensions shared by many contracts,
+# keyed by SKU, VIN and dealership id; contracts is the fact table, and
+# customers and claims belong to a single contract. The Parquet export
+# (star_export.py) writes the same tables and columns.
+metadata = Base.metadata
+
+products = Table(
+    "products",
+    metadata,
+    Column("sku", String, primary_key=True),
+    Column("sku_type", String, nullable=False),
+    Column("name", String, nullable=False),
+    Column("type", String, nullable=False),
+    Column("term", String),
+    Column("distance", String),
+    Column("term_months", Integer),
+    Column("dealer_cost", BigInteger, nullable=False),  # Amount in cents
+    Column("claim_amount", BigInteger),                 # Amount in cents
+    Column("double_gap", Boolean),
+    Column("max_model_years", Integer),
+    Column("max_model_km", Integer),
+    Column("commercial_eligible", Boolean),
+    Column("description", Text),
+)
+
+vehicles = Table(
+    "vehicles",
+    metadata,
+    Column("vin", String(17), primary_key=True),
+    Column("make", String, nullable=False),
+    Column("model", String, nullable=False),
+    Column("year", Integer, nullable=False),
+    Column("trim", String),
+    Column("transmission", String, nullable=False),
+    Column("num_cylinders", Integer, nullable=False),
+    Column("drivetrain", String),
+    Column("fuel_type", String),
+    Column("hybrid_electric", Boolean),
+)
+
+dealerships = Table(
+    "dealerships",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("name", String, nullable=False),
+)
+
+# Per-sale vehicle fields stored on the contract row instead of the VIN row
+# (with the vehicle's price as vehicle_price)
+CONTRACT_VEHICLE_FIELDS = [
+    "delivery_date", "in_service_date", "odometer", "odometer_unit",
+    "vehicle_usage", "lienholder"
+]
+
+contracts = Table(
+    "contracts",
+    metadata,
+    Column("id", BigInteger, primary_key=True, autoincrement=False),
+    Column("contract_number", String, nullable=False),
+    Column("prefixed_contract_number", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("contract_type", String, nullable=False),
+    Column("product_sku", String, ForeignKey("products.sku"), nullable=False),
+    Column("vehicle_vin", String(17), ForeignKey("vehicles.vin"), nullable=False),
+    # Vehicle details that belong to this sale rather than to the VIN
+    Column("delivery_date", DateTime(timezone=True)),
+    Column("in_service_date", DateTime(timezone=True)),
+    Column("odometer", Integer),
+    Column("odometer_unit", String),
+    Column("vehicle_usage", String),
+    Column("lienholder", String),
+    Column("vehicle_price", Numeric(12, 2)),
+    Column("contract_price", Numeric(12, 2), nullable=False),
+    Column("tax", Numeric(12, 2), nullable=False),
+    Column("total", Numeric(12, 2), nullable=False),
+    Column("subtotal", BigInteger, nullable=False),  # Amount in cents
+    Column("creator", String, nullable=False),
+    Column("salesperson", String, nullable=False),
+    Column("account_admin", String, nullable=False),
+    # The name stays on the fact for contracts sold without a dealership id
+    Column("dealership", String, nullable=False),
+    Column("dealership_id", Integer, ForeignKey("dealerships.id")),
+    Column("ready_for_completion", Boolean),
+    Column("tax_exempt", Boolean, nullable=False),
+    Column("is_void_eligible", Boolean, nullable=False),
+    Column("has_exception", Boolean, nullable=False),
+    Column("pdf_url", String, nullable=False),
+    Column("claims_url", String, nullable=False),
+    Column("alert_notes", JSONB),
+    Column("void", JSONB),
+    Column("completed_at", DateTime(timezone=True)),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("deleted_at", DateTime(timezone=True)),
+    # Keyset pagination of GET /contracts/ walks (created_at, id), alone or
+    # after an equality filter; see queries.contract_page
+    Index("ix_contracts_created_at_id", "created_at", "id"),
+    Index("ix_contracts_status_created_at_id", "status", "created_at", "id"),
+    Index("ix_contracts_contract_type_created_at_id", "contract_type", "created_at", "id"),
+    Index("ix_contracts_dealership_id_created_at_id", "dealership_id", "created_at", "id"),
+)
+
+customers = Table(
+    "customers",
+    metadata,
+    Column("contract_id", BigInteger, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True),
+    Column("first_name", String, nullable=False),
+    Column("last_name", String, nullable=False),
+    Column("address1", String, nullable=False),
+    Column("address2", String),
+    Column("city", String, nullable=False),
+    Column("province", String, nullable=False),
+    Column("postal_code", String, nullable=False),
+    Column("phone", String, nullable=False),
+    Column("email", String, nullable=False),
+    Column("birthdate", JSONB),
+    Column("native_status_number", String),
+    Column("mail_in_signature_expected", Boolean),
+)
+
+claims = Table(
+    "claims",
+    metadata,
+    Column("id", BigInteger, primary_key=True, autoincrement=False),
+    Column("contract_id", BigInteger, ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("authorization_number", String),
+    Column("repair_facility_name", String),
+    Column("km_at_claim_time", Integer),
+    Column("date_of_repair", DateTime(timezone=True)),
+    Column("labour_price", BigInteger),  # Amount in cents
+    Column("parts_price", BigInteger),   # Amount in cents
+    Column("tax_price", BigInteger),     # Amount in cents
+    Column("other_price", BigInteger),   # Amount in cents
+    Column("pre_tax_price", BigInteger),
+    Column("adjusting_cost", BigInteger),
+    Column("status", String, nullable=False),
+    Column("type", String),
+    Column("reason", Text),
+    Column("notes", JSONB),
+    Column("opened_at", DateTime(timezone=True)),
+    Column("closed_at", DateTime(timezone=True)),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("deleted_at", DateTime(timezone=True)),
+)
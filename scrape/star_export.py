@@ -0,0 +1,199 @@
+"""Export scraped contracts as a star schema of Parquet files.
+
+Every table in src/tables.py becomes <table>.parquet with the same columns,
+split the same way the Postgres loader splits contracts (star_schema.py):
+
+    products.parquet      one row per SKU
+    vehicles.parquet      one row per VIN
+    dealerships.parquet   one row per dealership id
+    contracts.parquet     the fact table, with product_sku, vehicle_vin and
+                          dealership_id keys into the dimensions
+    customers.parquet     one row per contract
+    claims.parquet        one row per claim, keyed by contract_id
+
+Contracts are read once each, in their latest version, from the local store
+and validated against src.models.Contract first, like the loader.
+
+    python star_export.py                          # scraped_data/ -> scraped_data/star/
+    python star_export.py --output /tmp/star
+
+    tables = load_star("scraped_data/star")
+    tables["contracts"].merge(tables["products"], left_on="product_sku", right_on="sku")
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import ValidationError
+from sqlalchemy import BigInteger, Boolean, DateTime, Integer, Numeric
+from sqlalchemy.dialects.postgresql import JSONB
+
+from contract_loader import CACHE_DIR, iter_contracts
+from src.models import Contract
+from src.tables import contracts
+from star_schema import DIMENSIONS, LOAD_ORDER, primary_key, split_contract
+
+STAR_DIR = "star"
+
+def _arrow_type(column):
+    # BigInteger is an Integer subclass, so it is checked first
+    if isinstance(column.type, BigInteger):
+        return pa.int64()
+    if isinstance(column.type, Integer):
+        return pa.int32()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(column.type, Numeric):
+        return pa.float64()
+    # String, Text, and JSONB kept as JSON text
+    return pa.string()
+
+def _converter(column):
+    """How a model_dump(mode="json") value becomes the column's Arrow value"""
+    if isinstance(column.type, DateTime):
+        return lambda value: None if value is None else datetime.fromisoformat(value)
+    if isinstance(column.type, JSONB):
+        return lambda value: None if value is None else json.dumps(value, separators=(",", ":"))
+    return None
+
+def table_schema(table):
+    """The Arrow schema matching a src/tables.py table"""
+    return pa.schema([pa.field(column.name, _arrow_type(column)) for column in table.columns])
+
+class StarWriter:
+    """
+    Split validated contracts into star-schema Parquet files
+
+    Fact and child rows are written in batches as they arrive; dimension rows
+    are deduplicated by primary key (the last version seen wins) and written
+    on close(). Files are written under temporary names and renamed when
+    complete.
+    """
+    def __init__(self, output_dir, batch_size=10000):
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.schemas = {table: table_schema(table) for table in LOAD_ORDER}
+        self.converters = {
+            table: [(column.name, _converter(column)) for column in table.columns if _converter(column)]
+            for table in LOAD_ORDER
+        }
+        self.dimensions = {table: {} for table in DIMENSIONS}
+        self.pending = {table: [] for table in LOAD_ORDER if table not in DIMENSIONS}
+        self.writers = {}
+        self.rows = {table: 0 for table in LOAD_ORDER}
+
+    def _path(self, table):
+        return os.path.join(self.output_dir, f"{table.name}.parquet")
+
+    def _write(self, table, rows):
+        for row in rows:
+            for name, convert in self.converters[table]:
+                row[name] = convert(row[name])
+
+        writer = self.writers.get(table)
+        if writer is None:
+            writer = self.writers[table] = pq.ParquetWriter(
+                f"{self._path(table)}.tmp", self.schemas[table], compression="zstd"
+            )
+        writer.write_table(pa.Table.from_pylist(rows, schema=self.schemas[table]))
+        self.rows[table] += len(rows)
+
+    def add(self, contract):
+        """Queue one validated Contract"""
+        for table, rows in split_contract(contract).items():
+            if table in self.dimensions:
+                for row in rows:
+                    self.dimensions[table][primary_key(table, row)] = row
+            else:
+                self.pending[table].extend(rows)
+
+        if len(self.pending[contracts]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table, rows in self.pending.items():
+            if rows:
+                self._write(table, rows)
+        self.pending = {table: [] for table in self.pending}
+
+    def close(self):
+        """Write the dimensions and any pending rows, then move the files into place"""
+        self.flush()
+        for table, rows in self.dimensions.items():
+            if rows:
+                self._write(table, list(rows.values()))
+
+        for table in LOAD_ORDER:
+            if table not in self.writers:
+                # Keep every table present, with its columns, even when empty
+                self._write(table, [])
+            self.writers.pop(table).close()
+            os.replace(f"{self._path(table)}.tmp", self._path(table))
+
+def export_star(directory, output_dir=None, batch_size=10000):
+    """Export the deduplicated contracts in directory; returns {table name: rows}"""
+    output_dir = output_dir or os.path.join(directory, STAR_DIR)
+    writer = StarWriter(output_dir, batch_size)
+    invalid = 0
+    for record in iter_contracts(directory):
+        try:
+            contract = Contract.model_validate(record)
+        except ValidationError as e:
+            invalid += 1
+            if invalid <= 10:
+                print(f"Skipping invalid contract {record.get('id')}: "
+                      f"{e.error_count()} errors, first: {e.errors()[0]['loc']} {e.errors()[0]['msg']}")
+            continue
+        writer.add(contract)
+    writer.close()
+
+    if invalid:
+        print(f"Skipped {invalid} invalid contracts")
+    return {table.name: writer.rows[table] for table in LOAD_ORDER}
+
+def load_star(star_dir, tables=None):
+    """Read the exported tables (all by default) as {name: DataFrame}"""
+    names = tables or [table.name for table in LOAD_ORDER]
+    return {name: pd.read_parquet(os.path.join(star_dir, f"{name}.parquet")) for name in names}
+
+def _directory_size(path):
+    if not os.path.isdir(path):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.name.endswith(".parquet"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Export scraped contracts as star-schema Parquet files")
+    parser.add_argument("--directory", default="scraped_data")
+    parser.add_argument("--output", help="default: <directory>/star")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    output_dir = args.output or os.path.join(args.directory, STAR_DIR)
+    start = time.perf_counter()
+    rows = export_star(args.directory, output_dir, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    print("\nStar Schema Export")
+    print("-" * 80)
+    print(f"{'table':<16}{'rows':>12}{'MB':>10}")
+    for name, count in rows.items():
+        size = os.path.getsize(os.path.join(output_dir, f"{name}.parquet"))
+        print(f"{name:<16}{count:>12}{size / 1e6:>10.2f}")
+    print(f"{'total':<28}{_directory_size(output_dir) / 1e6:>10.2f}")
+
+    flat_size = _directory_size(os.path.join(args.directory, CACHE_DIR))
+    if flat_size:
+        print(f"Flattened Parquet cache: {flat_size / 1e6:.2f} MB")
+    print(f"Exported to {output_dir} in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Star-schema layout shared by the Postgres loader and the Parquet export.
+
+A validated contract is split into rows for the tables in src/tables.py: the
+products, vehicles and dealerships dimensions (keyed by SKU, VIN and dealership
+id), the contracts fact table holding their keys, and the customers and claims
+that belong to one contract. Dimension rows repeat across contracts; callers
+deduplicate them by primary key.
+"""
+from src.tables import (
+    CONTRACT_VEHICLE_FIELDS, products, vehicles, dealerships, contracts, customers, claims
+)
+
+# Parents before children so foreign keys resolve within a batch
+LOAD_ORDER = [products, vehicles, dealerships, contracts, customers, claims]
+DIMENSIONS = [products, vehicles, dealerships]
+
+def table_row(table, values):
+    """Pick the table's columns out of values; every row gets every column"""
+    return {column.name: values.get(column.name) for column in table.columns}
+
+def primary_key(table, row):
+    return tuple(row[column.name] for column in table.primary_key.columns)
+
+def split_contract(contract):
+    """Split a validated Contract into {table: [rows]}"""
+    data = contract.model_dump(mode="json")
+    product = data.pop("product")
+    vehicle = data.pop("vehicle")
+    customer = data.pop("customer")
+    contract_claims = data.pop("claims")
+
+    data["product_sku"] = product["sku"]
+    data["vehicle_vin"] = vehicle["vin"]
+    data["vehicle_price"] = vehicle.get("price")
+    for field in CONTRACT_VEHICLE_FIELDS:
+        data[field] = vehicle.get(field)
+
+    dealership_rows = []
+    if data.get("dealership_id") is not None:
+        dealership_rows.append({"id": data["dealership_id"], "name": data["dealership"]})
+
+    return {
+        products: [table_row(products, product)],
+        vehicles: [table_row(vehicles, vehicle)],
+        dealerships: dealership_rows,
+        contracts: [table_row(contracts, data)],
+        customers: [table_row(customers, dict(customer, contract_id=contract.id))],
+        claims: [table_row(claims, claim) for claim in contract_claims],
+    }